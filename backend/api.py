@@ -1,70 +1,110 @@
 #!/bin/python3
 
+import io
 import string
 
 # Placeholders
 # Call these functions from the frontend
-# Note that all files, by default, are in the same folder as the code being executed
-
-from magic import magic
-from lsb import putTextIntoLSB, getTheTextFromLSB 
-from colorChannels import combineColorChannels, separateChannels
-from enlargen import getTheTextFromEnlarged, hideTextByEnlarging
-
-def hideTextInLSB(fileName: string, text: string, bitDepth: int=1):
+# Results are written to the given path, or by default to a new, unique file in the temp directory
+# Pass stats=Stats() to any of them to see where the time went
+# Functions that write images take encoding='fast' or 'small' to trade file size for speed
+# Hidden text is stored with its length in front of it (see payload.py), legacy=True hides it the old way
+# and compression='zlib' or 'lzma' compresses it first
+
+from magic import magic, magicInMemory
+from lsb import putTextIntoLSB, getTheTextFromLSB, capacityOfLSB, putTextIntoLSBInMemory
+from colorChannels import combineColorChannels, separateChannels, combineColorChannelsInMemory, separateChannelsInMemory
+from enlargen import getTheTextFromEnlarged, hideTextByEnlarging, hideTextByEnlargingInMemory
+from pngTools import Stats, imageCache, EncodeOptions, encodePresets
+from payload import setDecompressedLimit
+
+def hideTextInLSB(fileName: string, text: string, bitDepth: int=1, streaming: bool=False, progress=None, outputFile: string=None, stats=None, encoding=None, legacy: bool=False, compression: string=None, workers: int=1):
 	'''
 	Given an image and text, hide the text in the Least Significant Bits and save it as another image.
 
 	Parameters:
 	fileName (string): The original image file.
-	text (string): The text to be hidden.
+	text (string or bytes): The text to be hidden, or any binary data.
+	bitDepth (int): The number of Least Significant Bits used for embedding the text, 1 to 8. Default is 1.
+	streaming (bool): Embed row by row, keeping only a few rows in memory. Default is False.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	outputFile (string): Where to write the result. Default is a new, unique file in the temp directory.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
+	legacy (bool): Hide text the old way, ended by a zero char, so versions from before the payload header can read it. Default is False.
+	compression (string): Compress the payload first, with 'zlib' or 'lzma', so it fits in fewer pixels. Pays off for text longer than a few hundred bytes. Default is None.
+	workers (int): Embed with this many processes, each on its own band of rows. Pays off for payloads spread over many megapixels. None uses one per CPU. Default is 1.
 
 	Returns:
 	newFileName: The path to the modified image.
 	'''
 
-	newFileName = putTextIntoLSB(fileName, text, bitDepth)
+	newFileName = putTextIntoLSB(fileName, text, bitDepth, outputFile, streaming=streaming, progress=progress, stats=stats, encoding=encoding, legacy=legacy, compression=compression, workers=workers)
 
 	return newFileName
 
 
 
-def mixTwoImagesMagic(image1Path: string, image2Path: string):
+def mixTwoImagesMagic(image1Path: string, image2Path: string, progress=None, outputFile: string=None, stats=None, encoding=None):
 	'''
 	Mix two images such that one shows on light background, and the other on black.
 
 	Parameters:
 	image1Path (string): The file path of the first image.
 	image2Path (string): The file path of the second image.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	outputFile (string): Where to write the result. Default is a new, unique file in the temp directory.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
 
 	Returns:
 	newImagePath: The path to the new image with the two images mixed.
 	'''
 	
-	newImagePath = magic(image1Path, image2Path)
+	newImagePath = magic(image1Path, image2Path, outputFile, progress=progress, stats=stats, encoding=encoding)
 
 	return newImagePath
 
 
-def getTextFromLSB(fileName: string, bitDepth: int=1):
+def getTextFromLSB(fileName: string, bitDepth: int=1, progress=None, stats=None):
 	'''
 	Given an image, extract hidden text from the Least Significant Bits.
 
 	Parameters:
 	fileName (string): The file path of the image with hidden text.
-	bitDepth (int): The number of Least Significant Bits used for embedding the text. Default is 1.
+	bitDepth (int): The number of Least Significant Bits used for embedding the text, 1 to 8. Default is 1.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
 
 	Returns:
-	extractedText: The text extracted from the image.
+	extractedText: The text extracted from the image, or bytes if binary data was hidden.
 	'''
 
 
-	extractedText  = getTheTextFromLSB(fileName, bitDepth)
+	extractedText  = getTheTextFromLSB(fileName, bitDepth, progress=progress, stats=stats)
 
 	return extractedText
 
 
-def mixColorChannels(redImagePath: string, greenImagePath: string, blueImagePath: string):
+def getLSBCapacity(fileName: string, bitDepth: int=1):
+	'''
+	Given an image, find how many characters can be hidden in its Least Significant Bits.
+	Only the image header is read.
+
+	Parameters:
+	fileName (string): The original image file.
+	bitDepth (int): The number of Least Significant Bits used for embedding the text, 1 to 8. Default is 1.
+
+	Returns:
+	capacity: The number of bytes that fit. Text takes one per ASCII character.
+	'''
+
+	capacity = capacityOfLSB(fileName, bitDepth)
+
+	return capacity
+
+
+def mixColorChannels(redImagePath: string, greenImagePath: string, blueImagePath: string, progress=None, outputFile: string=None, stats=None, encoding=None):
 	'''
 	Given three images representing red, green, and blue color channels, combine them into a single RGB image.
 
@@ -72,22 +112,30 @@ def mixColorChannels(redImagePath: string, greenImagePath: string, blueImagePath
 	redImagePath (string): The file path of the red channel image.
 	greenImagePath (string): The file path of the green channel image.
 	blueImagePath (string): The file path of the blue channel image.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	outputFile (string): Where to write the result. Default is a new, unique file in the temp directory.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
 
 	Returns:
 	rgbImagePath: The path to the new RGB image.
 	'''
 
-	rgbImagePath = combineColorChannels(redImagePath, greenImagePath, blueImagePath)
+	rgbImagePath = combineColorChannels(redImagePath, greenImagePath, blueImagePath, outputFile, progress=progress, stats=stats, encoding=encoding)
 
 	return rgbImagePath
 
 
-def separateColorChannels(rgbImagePath: string):
+def separateColorChannels(rgbImagePath: string, progress=None, outputFiles=None, stats=None, encoding=None):
 	'''
 	Given an RGB image, separate it into its red, green, and blue color channel images.
 
 	Parameters:
 	rgbImagePath (string): The file path of the RGB image.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	outputFiles (tuple): Where to write the red, green and blue images. Default is three new, unique files in the temp directory.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
 
 	Returns:
 	redImagePath: The path to the red channel image.
@@ -95,39 +143,347 @@ def separateColorChannels(rgbImagePath: string):
 	blueImagePath: The path to the blue channel image.
 	'''
 
-	red, green, blue = separateChannels(rgbImagePath)
+	red, green, blue = separateChannels(rgbImagePath, outputFiles, progress=progress, stats=stats, encoding=encoding)
 
 	return red, green, blue
 
 
 
-def hideTextByMakingImageLarger(fileName: string, text: string):
+def hideTextByMakingImageLarger(fileName: string, text: string, streaming: bool=False, progress=None, outputFile: string=None, stats=None, encoding=None, legacy: bool=False, compression: string=None):
 	'''
 	Given an image and text, hide the text in the image by doubling the image's size.
 
 	Parameters:
 	fileName (string): The original image file.
-	text (string): The text to be hidden.
+	text (string or bytes): The text to be hidden, or any binary data.
+	streaming (bool): Write the output as the input is read, keeping only a few rows in memory. Default is False.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	outputFile (string): Where to write the result. Default is a new, unique file in the temp directory.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
+	legacy (bool): Hide text the old way, ended by a zero char, so versions from before the payload header can read it. Default is False.
+	compression (string): Compress the payload first, with 'zlib' or 'lzma', so it fits in fewer pixels. Pays off for text longer than a few hundred bytes. Default is None.
 
 	Returns:
 	newFileName: The path to the modified image.
 	'''
 
-	newFileName = hideTextByEnlarging(fileName, text)
+	newFileName = hideTextByEnlarging(fileName, text, outputFile, streaming=streaming, progress=progress, stats=stats, encoding=encoding, legacy=legacy, compression=compression)
 
 	return newFileName
 
 
-def getTextFromLargeImage(fileName: string):
+def getTextFromLargeImage(fileName: string, progress=None, stats=None):
 	'''
 	Given an image, extract text hidden in the "Make Image Larger" algorithm.
 
 	Parameters:
 	fileName (string): The file path of the image with hidden text.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+
+	Returns:
+	extractedText: The text extracted from the image, or bytes if binary data was hidden.
+	'''
+	extractedText = getTheTextFromEnlarged(fileName, progress=progress, stats=stats)
+
+	return extractedText
+
+
+
+def setImageCacheLimit(maxBytes: int):
+	'''
+	Decoded images are kept in memory, so working on the same file again skips decoding it.
+	Set how much memory they may take before the least recently used ones are dropped.
+
+	Parameters:
+	maxBytes (int): The most memory the cached pixels may take. 0 turns the cache off. Default is 256 MiB.
+	'''
+
+	imageCache.setLimit(maxBytes)
+
+
+def clearImageCache():
+	'''
+	Forget every decoded image kept in memory.
+	'''
+
+	imageCache.clear()
+
+
+def setPayloadSizeLimit(maxBytes: int):
+	'''
+	Hidden payloads that were compressed are not decompressed past this size, so a small image can't claim gigabytes of memory.
+
+	Parameters:
+	maxBytes (int): The most bytes a compressed payload may decompress to, extraction raises ValueError past it. Default is 64 MiB.
+	'''
+
+	setDecompressedLimit(maxBytes)
+
+
+
+# In-memory variants
+# These return the decoded result without writing anything, so the frontend can show it
+# right away and only encode it when the user saves it
+
+def hideTextInLSBInMemory(fileName: string, text: string, bitDepth: int=1, progress=None, stats=None, legacy: bool=False, compression: string=None, workers: int=1):
+	'''
+	Given an image and text, hide the text in the Least Significant Bits and keep the result in memory.
+
+	Parameters:
+	fileName (string): The original image file.
+	text (string or bytes): The text to be hidden, or any binary data.
+	bitDepth (int): The number of Least Significant Bits used for embedding the text, 1 to 8. Default is 1.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	legacy (bool): Hide text the old way, ended by a zero char, so versions from before the payload header can read it. Default is False.
+	compression (string): Compress the payload first, with 'zlib' or 'lzma', so it fits in fewer pixels. Pays off for text longer than a few hundred bytes. Default is None.
+	workers (int): Embed with this many processes, each on its own band of rows. Pays off for payloads spread over many megapixels. None uses one per CPU. Default is 1.
+
+	Returns:
+	image (ImageResult): The modified image, kept in memory. image.pixels holds the pixel rows, image.pngBytes() encodes it the first time it's called, image.save(path) writes it to a file.
+	'''
+
+	image = putTextIntoLSBInMemory(fileName, text, bitDepth, progress=progress, stats=stats, legacy=legacy, compression=compression, workers=workers)
+
+	return image
+
+
+def mixTwoImagesMagicInMemory(image1Path: string, image2Path: string, progress=None, stats=None):
+	'''
+	Mix two images such that one shows on light background, and the other on black, and keep the result in memory.
+
+	Parameters:
+	image1Path (string): The file path of the first image.
+	image2Path (string): The file path of the second image.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+
+	Returns:
+	image (ImageResult): The new image with the two images mixed, kept in memory. image.pixels holds the pixel rows, image.pngBytes() encodes it the first time it's called, image.save(path) writes it to a file.
+	'''
+
+	image = magicInMemory(image1Path, image2Path, progress=progress, stats=stats)
+
+	return image
+
+
+def mixColorChannelsInMemory(redImagePath: string, greenImagePath: string, blueImagePath: string, progress=None, stats=None):
+	'''
+	Given three images representing red, green, and blue color channels, combine them into a single RGB image kept in memory.
+
+	Parameters:
+	redImagePath (string): The file path of the red channel image.
+	greenImagePath (string): The file path of the green channel image.
+	blueImagePath (string): The file path of the blue channel image.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+
+	Returns:
+	image (ImageResult): The new RGB image, kept in memory. image.pixels holds the pixel rows, image.pngBytes() encodes it the first time it's called, image.save(path) writes it to a file.
+	'''
+
+	image = combineColorChannelsInMemory(redImagePath, greenImagePath, blueImagePath, progress=progress, stats=stats)
+
+	return image
+
+
+def separateColorChannelsInMemory(rgbImagePath: string, progress=None, stats=None):
+	'''
+	Given an RGB image, separate it into its red, green, and blue color channel images, kept in memory.
+
+	Parameters:
+	rgbImagePath (string): The file path of the RGB image.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+
+	Returns:
+	red, green, blue (ImageResult): The three greyscale channel images, see hideTextInLSBInMemory.
+	'''
+
+	red, green, blue = separateChannelsInMemory(rgbImagePath, progress=progress, stats=stats)
+
+	return red, green, blue
+
+
+def hideTextByMakingImageLargerInMemory(fileName: string, text: string, progress=None, stats=None, legacy: bool=False, compression: string=None):
+	'''
+	Given an image and text, hide the text in the image by doubling the image's size, and keep the result in memory.
+
+	Parameters:
+	fileName (string): The original image file.
+	text (string or bytes): The text to be hidden, or any binary data.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	legacy (bool): Hide text the old way, ended by a zero char, so versions from before the payload header can read it. Default is False.
+	compression (string): Compress the payload first, with 'zlib' or 'lzma', so it fits in fewer pixels. Pays off for text longer than a few hundred bytes. Default is None.
+
+	Returns:
+	image (ImageResult): The modified image, kept in memory. image.pixels holds the pixel rows, image.pngBytes() encodes it the first time it's called, image.save(path) writes it to a file.
+	'''
+
+	image = hideTextByEnlargingInMemory(fileName, text, progress=progress, stats=stats, legacy=legacy, compression=compression)
+
+	return image
+
+
+
+# Bytes variants
+# These take the images themselves instead of paths and give the results back as PNG bytes,
+# or write them to a given file object, so a service can use them without going through the disk
+# Images given as bytes or memoryviews aren't copied before decoding, pypng reads them a chunk at a time
+
+def hideTextInLSBBytes(image: bytes, text: string, bitDepth: int=1, streaming: bool=False, progress=None, stats=None, encoding=None, output=None, legacy: bool=False, compression: string=None, workers: int=1):
+	'''
+	Given an image and text, hide the text in the Least Significant Bits and give back the new image.
+
+	Parameters:
+	image (bytes, memoryview or file): The PNG itself, or a binary file object to read it from.
+	text (string or bytes): The text to be hidden, or any binary data.
+	bitDepth (int): The number of Least Significant Bits used for embedding the text, 1 to 8. Default is 1.
+	streaming (bool): Embed row by row, keeping only a few rows in memory. Default is False.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
+	output (file): A binary file object to write the PNG to. Default is None, which returns the PNG as bytes.
+	legacy (bool): Hide text the old way, ended by a zero char, so versions from before the payload header can read it. Default is False.
+	compression (string): Compress the payload first, with 'zlib' or 'lzma', so it fits in fewer pixels. Pays off for text longer than a few hundred bytes. Default is None.
+	workers (int): Embed with this many processes, each on its own band of rows. Pays off for payloads spread over many megapixels. None uses one per CPU. Default is 1.
+
+	Returns:
+	png: The modified image as PNG bytes, or output if it was given.
+	'''
+
+	target = io.BytesIO() if output is None else output
+	putTextIntoLSB(image, text, bitDepth, target, streaming=streaming, progress=progress, stats=stats, encoding=encoding, legacy=legacy, compression=compression, workers=workers)
+
+	return target.getvalue() if output is None else output
+
+
+def getTextFromLSBBytes(image: bytes, bitDepth: int=1, progress=None, stats=None):
+	'''
+	Given an image, extract hidden text from the Least Significant Bits.
+
+	Parameters:
+	image (bytes, memoryview or file): The PNG itself, or a binary file object to read it from.
+	bitDepth (int): The number of Least Significant Bits used for embedding the text, 1 to 8. Default is 1.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+
+	Returns:
+	extractedText: The text extracted from the image, or bytes if binary data was hidden.
+	'''
+
+	extractedText = getTheTextFromLSB(image, bitDepth, progress=progress, stats=stats)
+
+	return extractedText
+
+
+def mixTwoImagesMagicBytes(image1: bytes, image2: bytes, progress=None, stats=None, encoding=None, output=None):
+	'''
+	Mix two images such that one shows on light background, and the other on black, and give back the new image.
+
+	Parameters:
+	image1 (bytes, memoryview or file): The PNG itself, or a binary file object to read it from.
+	image2 (bytes, memoryview or file): The PNG itself, or a binary file object to read it from.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
+	output (file): A binary file object to write the PNG to. Default is None, which returns the PNG as bytes.
 
 	Returns:
-	extractedText: The text extracted from the image.
+	png: The new image with the two images mixed as PNG bytes, or output if it was given.
 	'''
-	extractedText = getTheTextFromEnlarged(fileName)
+
+	target = io.BytesIO() if output is None else output
+	magic(image1, image2, target, progress=progress, stats=stats, encoding=encoding)
+
+	return target.getvalue() if output is None else output
+
+
+def mixColorChannelsBytes(redImage: bytes, greenImage: bytes, blueImage: bytes, progress=None, stats=None, encoding=None, output=None):
+	'''
+	Given three images representing red, green, and blue color channels, combine them into a single RGB image and give it back.
+
+	Parameters:
+	redImage (bytes, memoryview or file): The red channel PNG, or a binary file object to read it from.
+	greenImage (bytes, memoryview or file): The green channel PNG, or a binary file object to read it from.
+	blueImage (bytes, memoryview or file): The blue channel PNG, or a binary file object to read it from.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
+	output (file): A binary file object to write the PNG to. Default is None, which returns the PNG as bytes.
+
+	Returns:
+	png: The new RGB image as PNG bytes, or output if it was given.
+	'''
+
+	target = io.BytesIO() if output is None else output
+	combineColorChannels(redImage, greenImage, blueImage, target, progress=progress, stats=stats, encoding=encoding)
+
+	return target.getvalue() if output is None else output
+
+
+def separateColorChannelsBytes(rgbImage: bytes, progress=None, stats=None, encoding=None, outputs=None):
+	'''
+	Given an RGB image, separate it into its red, green, and blue color channel images and give them back.
+
+	Parameters:
+	rgbImage (bytes, memoryview or file): The PNG itself, or a binary file object to read it from.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
+	outputs (tuple): Three binary file objects to write the red, green and blue PNGs to. Default is None, which returns them as bytes.
+
+	Returns:
+	red, green, blue: The three channel images as PNG bytes, or outputs if they were given.
+	'''
+
+	targets = (io.BytesIO(), io.BytesIO(), io.BytesIO()) if outputs is None else outputs
+	separateChannels(rgbImage, targets, progress=progress, stats=stats, encoding=encoding)
+
+	return tuple(target.getvalue() for target in targets) if outputs is None else outputs
+
+
+def hideTextByMakingImageLargerBytes(image: bytes, text: string, streaming: bool=False, progress=None, stats=None, encoding=None, output=None, legacy: bool=False, compression: string=None):
+	'''
+	Given an image and text, hide the text in the image by doubling the image's size, and give back the new image.
+
+	Parameters:
+	image (bytes, memoryview or file): The PNG itself, or a binary file object to read it from.
+	text (string or bytes): The text to be hidden, or any binary data.
+	streaming (bool): Write the output as the input is read, keeping only a few rows in memory. Default is False.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+	encoding (string or EncodeOptions): How the PNG is compressed: 'fast' for previews and intermediates, 'small' for final files, or EncodeOptions(compression, filter, chunkSize). Default is pypng's usual settings.
+	output (file): A binary file object to write the PNG to. Default is None, which returns the PNG as bytes.
+	legacy (bool): Hide text the old way, ended by a zero char, so versions from before the payload header can read it. Default is False.
+	compression (string): Compress the payload first, with 'zlib' or 'lzma', so it fits in fewer pixels. Pays off for text longer than a few hundred bytes. Default is None.
+
+	Returns:
+	png: The modified image as PNG bytes, or output if it was given.
+	'''
+
+	target = io.BytesIO() if output is None else output
+	hideTextByEnlarging(image, text, target, streaming=streaming, progress=progress, stats=stats, encoding=encoding, legacy=legacy, compression=compression)
+
+	return target.getvalue() if output is None else output
+
+
+def getTextFromLargeImageBytes(image: bytes, progress=None, stats=None):
+	'''
+	Given an image, extract text hidden in the "Make Image Larger" algorithm.
+
+	Parameters:
+	image (bytes, memoryview or file): The PNG itself, or a binary file object to read it from.
+	progress (callable): Called with (done, total) as the work goes on. Raising from it cancels the operation. Default is None.
+	stats (Stats): Filled in with the time spent decoding, transforming, encoding and on file I/O, and the pixels and bytes moved. Stats(callback) calls callback with it once the call is done. Default is None.
+
+	Returns:
+	extractedText: The text extracted from the image, or bytes if binary data was hidden.
+	'''
+
+	extractedText = getTheTextFromEnlarged(image, progress=progress, stats=stats)
 
 	return extractedText
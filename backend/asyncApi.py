@@ -0,0 +1,149 @@
+#!/bin/python3
+
+import asyncio
+import weakref
+import inspect
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import api
+
+# async versions of every api.py function, for callers running an asyncio event loop
+# The work runs on an executor, so the loop stays free while images are decoded, changed and encoded
+#
+# result = await asyncApi.hideTextInLSBBytes(upload, 'Hello', bitDepth=2)
+#
+# They take the same parameters as their api.py versions, plus executor= to use another executor for one call
+# progress, if given, is called on the event loop, not on the worker thread
+# Only so many calls run at once (setConcurrencyLimit), the others wait for a free slot before starting,
+# so a burst of uploads queues up instead of piling work and memory onto the executor
+# Cancelling the awaiting task stops the work at the next row, and the slot is only given back once it has stopped
+#
+# The default executor is a thread pool. A ProcessPoolExecutor (setExecutor) runs the engines
+# in parallel without sharing the GIL, but can't report progress or stats back, and a call can then only be
+# cancelled before it starts
+
+
+class Cancelled(Exception):
+	# Raised from the progress callback on the worker thread, it unwinds the engine
+	pass
+
+
+defaultExecutor = None
+concurrencyLimit = 4
+
+# One semaphore per event loop, asyncio primitives can't be shared between loops
+limits = weakref.WeakKeyDictionary()
+
+
+def setExecutor(executor):
+	'''
+	Set the executor the calls run on.
+
+	Parameters:
+	executor (Executor): A ThreadPoolExecutor or ProcessPoolExecutor. None goes back to the default thread pool.
+	'''
+
+	global defaultExecutor
+	defaultExecutor = executor
+
+
+def setConcurrencyLimit(limit: int):
+	'''
+	Set how many calls may run at once on each event loop. Calls over the limit wait for a running one to finish.
+	Calls that are already waiting keep the limit they started with.
+
+	Parameters:
+	limit (int): The most calls running at once. Default is 4.
+	'''
+
+	if limit < 1:
+		raise ValueError(f'The concurrency limit must be at least 1, not {limit}.')
+
+	global concurrencyLimit
+	concurrencyLimit = limit
+	limits.clear()
+
+
+def getExecutor():
+	global defaultExecutor
+	if defaultExecutor is None:
+		defaultExecutor = ThreadPoolExecutor(thread_name_prefix='asyncApi')
+
+	return defaultExecutor
+
+
+def slots(loop):
+	if loop not in limits:
+		limits[loop] = asyncio.Semaphore(concurrencyLimit)
+
+	return limits[loop]
+
+
+async def runInExecutor(function, args, kwargs, progress=None, executor=None):
+	loop = asyncio.get_running_loop()
+	executor = executor or getExecutor()
+	cancelled = threading.Event()
+
+	def report(done, total):
+		# Runs on the worker thread, for every row the engine handles
+		if cancelled.is_set():
+			raise Cancelled()
+		if progress is not None:
+			loop.call_soon_threadsafe(progress, done, total)
+
+	# Neither the callback nor the event can be sent to another process
+	if 'progress' in inspect.signature(function).parameters and not isinstance(executor, ProcessPoolExecutor):
+		kwargs['progress'] = report
+
+	async with slots(loop):
+		work = executor.submit(function, *args, **kwargs)
+		future = asyncio.wrap_future(work, loop=loop)
+
+		try:
+			# shield keeps a cancellation from dropping the future while its work goes on
+			return await asyncio.shield(future)
+		except asyncio.CancelledError:
+			# A call that hasn't started is dropped, one that has stops at its next row
+			# Either way its slot is kept until the executor is done with it
+			cancelled.set()
+			work.cancel()
+			await asyncio.wait([future])
+
+			# It ends with the Cancelled raised from report, which nobody needs to hear about
+			if not future.cancelled():
+				future.exception()
+			raise
+
+
+def asyncVersion(function):
+	@functools.wraps(function)
+	async def wrapper(*args, progress=None, executor=None, **kwargs):
+		return await runInExecutor(function, args, kwargs, progress, executor)
+
+	return wrapper
+
+
+hideTextInLSB = asyncVersion(api.hideTextInLSB)
+getTextFromLSB = asyncVersion(api.getTextFromLSB)
+getLSBCapacity = asyncVersion(api.getLSBCapacity)
+mixTwoImagesMagic = asyncVersion(api.mixTwoImagesMagic)
+mixColorChannels = asyncVersion(api.mixColorChannels)
+separateColorChannels = asyncVersion(api.separateColorChannels)
+hideTextByMakingImageLarger = asyncVersion(api.hideTextByMakingImageLarger)
+getTextFromLargeImage = asyncVersion(api.getTextFromLargeImage)
+
+hideTextInLSBInMemory = asyncVersion(api.hideTextInLSBInMemory)
+mixTwoImagesMagicInMemory = asyncVersion(api.mixTwoImagesMagicInMemory)
+mixColorChannelsInMemory = asyncVersion(api.mixColorChannelsInMemory)
+separateColorChannelsInMemory = asyncVersion(api.separateColorChannelsInMemory)
+hideTextByMakingImageLargerInMemory = asyncVersion(api.hideTextByMakingImageLargerInMemory)
+
+hideTextInLSBBytes = asyncVersion(api.hideTextInLSBBytes)
+getTextFromLSBBytes = asyncVersion(api.getTextFromLSBBytes)
+mixTwoImagesMagicBytes = asyncVersion(api.mixTwoImagesMagicBytes)
+mixColorChannelsBytes = asyncVersion(api.mixColorChannelsBytes)
+separateColorChannelsBytes = asyncVersion(api.separateColorChannelsBytes)
+hideTextByMakingImageLargerBytes = asyncVersion(api.hideTextByMakingImageLargerBytes)
+getTextFromLargeImageBytes = asyncVersion(api.getTextFromLargeImageBytes)
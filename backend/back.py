@@ -1,7 +1,383 @@
 # backend.py
+# Local job service: runs api.py operations on a pool of worker processes that stay up
+# between jobs, so the GUI and batch clients share one set of warm workers (and their decoded image cache)
+# It only listens on localhost
+#
+# python3 back.py --port 8765 --workers 4 --queue-size 64
+#
+# POST   /jobs             {"operation": "hideTextInLSB", "params": {"fileName": "a.png", "text": "hi"}}
+#                          -> 202 {"id": ...}, 503 when the queue is full
+# GET    /jobs/<id>        -> {"id", "operation", "status", ...}, status is queued, running, done, failed or cancelled
+# GET    /jobs/<id>/result -> {"result": ...} once the job is done, 409 before that. bytes come as {"base64": ...}
+# DELETE /jobs/<id>        cancels a job that is still queued
+# GET    /status           -> workers, queue size, jobs queued, jobs running, jobs known
+#
+# Jobs read and write whatever paths they're given, so web pages must not be able to reach it:
+# requests need Host 127.0.0.1 or localhost (against DNS rebinding), and POSTs need Content-Type application/json,
+# which browsers can't send cross-origin without a preflight the service never answers
+# With --token (or STEGA_TOKEN set), every request also needs that token in an X-Stega-Token header,
+# clients here send $STEGA_TOKEN
+import os
+import hmac
+import json
 import time
+import uuid
+import signal
+import argparse
+import threading
+import multiprocessing
+import urllib.error
+import urllib.request
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
-def perform_task(data):
-    """Simulates backend processing."""
-    time.sleep(2)  # Simulating a delay
-    return f"Processed data: {data.upper()}"
+from batch import operations, runJob, resultToJSON, resultFromJSON
+
+DEFAULT_URL = 'http://127.0.0.1:8765'
+LOCAL_HOSTS = ('127.0.0.1', 'localhost')
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is full."""
+
+
+class JobService:
+    """Queues jobs for a process pool and keeps track of them until they're collected."""
+
+    def __init__(self, workers=None, queue_size=64, history=1000):
+        # queue_size bounds the jobs waiting or running, history the finished jobs kept around for polling
+        self.workers = workers or os.cpu_count()
+        self.pool = self.new_pool()
+        self.queue_size = queue_size
+        self.history = history
+        self.jobs = OrderedDict()
+        # The pool would take every job at once, so they wait here until a worker is free
+        # That keeps them cancellable, and their status honest
+        self.waiting = deque()
+        self.running = 0
+        # Reentrant: a job that is already done runs job_done right away, from inside dispatch
+        self.lock = threading.RLock()
+
+    def new_pool(self):
+        # Forked workers would inherit the server's socket and keep the port taken if the service gets killed
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def replace_pool(self, broken):
+        # Called with the lock held. A worker that dies (killed for memory, say) breaks its pool for good
+        if self.pool is broken:
+            self.pool = self.new_pool()
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, operation, params):
+        if operation not in operations:
+            raise ValueError(f'Unknown operation: {operation}')
+        if not isinstance(params, dict):
+            raise ValueError('params must be an object')
+
+        with self.lock:
+            if len(self.waiting) + self.running >= self.queue_size:
+                raise QueueFull(f'{self.queue_size} jobs are already waiting or running')
+
+            job_id = uuid.uuid4().hex
+            job = {'id': job_id, 'operation': operation, 'params': params, 'submitted': time.time(), 'future': None, 'cancelled': False}
+            self.jobs[job_id] = job
+            self.waiting.append(job)
+
+            self.dispatch()
+            self.forget_old_jobs()
+
+        return job_id
+
+    def dispatch(self):
+        # Called with the lock held. Hands waiting jobs to the pool while there are free workers
+        while self.waiting and self.running < self.workers:
+            job = self.waiting.popleft()
+            job['started'] = time.time()
+            pool = self.pool
+
+            try:
+                future = pool.submit(runJob, job['operation'], job['params'])
+            except BrokenProcessPool as e:
+                # The job fails instead of staying queued forever, the ones after it get a new pool
+                job['future'] = Future()
+                job['future'].set_exception(e)
+                self.replace_pool(pool)
+                continue
+
+            job['future'] = future
+            self.running += 1
+            future.add_done_callback(lambda future, pool=pool: self.job_done(future, pool))
+
+    def job_done(self, future, pool):
+        with self.lock:
+            self.running -= 1
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                self.replace_pool(pool)
+            self.dispatch()
+
+    def forget_old_jobs(self):
+        # Called with the lock held. The oldest finished jobs go first, unfinished ones are never dropped
+        finished = [job_id for job_id, job in self.jobs.items() if job['cancelled'] or (job['future'] and job['future'].done())]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def job(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self, job):
+        future = job['future']
+        status = {'id': job['id'], 'operation': job['operation'], 'submitted': job['submitted']}
+
+        if job['cancelled']:
+            status['status'] = 'cancelled'
+        elif future is None:
+            status['status'] = 'queued'
+        elif future.done():
+            error = future.exception()
+            if error is None:
+                result, error, seconds = future.result()
+                status['seconds'] = seconds
+            else:
+                # The worker process itself died
+                error = f'{type(error).__name__}: {error}'
+
+            status['status'] = 'failed' if error else 'done'
+            if error:
+                status['error'] = error
+        else:
+            status['status'] = 'running'
+
+        return status
+
+    def result(self, job):
+        # Only called for jobs that are done
+        return job['future'].result()[0]
+
+    def cancel(self, job):
+        # Only jobs still waiting for a worker can be cancelled
+        with self.lock:
+            if job['future'] is not None or job['cancelled']:
+                return job['cancelled']
+
+            self.waiting.remove(job)
+            job['cancelled'] = True
+
+        return True
+
+    def summary(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'queueSize': self.queue_size,
+                'queued': len(self.waiting),
+                'running': self.running,
+                'jobs': len(self.jobs),
+            }
+
+    def shutdown(self):
+        with self.lock:
+            for job in self.waiting:
+                job['cancelled'] = True
+            self.waiting.clear()
+
+        self.pool.shutdown()
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    """Maps the HTTP requests onto the JobService in self.server.service."""
+
+    def send_json(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def allowed(self, json_body=False):
+        # Sends a 403, or 415 for the wrong Content-Type, and returns False if the request has to be turned away
+        host = self.headers.get('Host', '').rsplit(':', 1)[0]
+        if host not in LOCAL_HOSTS:
+            self.send_json(403, {'error': f'Host must be one of {", ".join(LOCAL_HOSTS)}'})
+            return False
+
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get('X-Stega-Token', ''), token):
+            self.send_json(403, {'error': 'Missing or wrong X-Stega-Token'})
+            return False
+
+        if json_body and self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            self.send_json(415, {'error': 'Content-Type must be application/json'})
+            return False
+
+        return True
+
+    def find_job(self):
+        # /jobs/<id> and /jobs/<id>/result, sends a 404 and returns None for anything else
+        parts = self.path.strip('/').split('/')
+        job = self.server.service.job(parts[1]) if len(parts) in (2, 3) and parts[0] == 'jobs' else None
+
+        if job is None:
+            self.send_json(404, {'error': f'No such job: {self.path}'})
+
+        return job, parts[2:]
+
+    def do_POST(self):
+        if not self.allowed(json_body=True):
+            return
+
+        if self.path.rstrip('/') != '/jobs':
+            self.send_json(404, {'error': f'Nothing to post to at {self.path}'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            job_id = self.server.service.submit(body.get('operation'), body.get('params', {}))
+        except QueueFull as e:
+            self.send_json(503, {'error': str(e)})
+        except (ValueError, AttributeError) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': f'{type(e).__name__}: {e}'})
+        else:
+            self.send_json(202, {'id': job_id})
+
+    def do_GET(self):
+        if not self.allowed():
+            return
+
+        if self.path.rstrip('/') == '/status':
+            self.send_json(200, self.server.service.summary())
+            return
+
+        job, rest = self.find_job()
+        if job is None:
+            return
+
+        status = self.server.service.status(job)
+
+        if rest == ['result']:
+            if status['status'] != 'done':
+                self.send_json(409, status)
+            else:
+                self.send_json(200, {'id': job['id'], 'result': resultToJSON(self.server.service.result(job))})
+        elif rest:
+            self.send_json(404, {'error': f'No such job: {self.path}'})
+        else:
+            self.send_json(200, status)
+
+    def do_DELETE(self):
+        if not self.allowed():
+            return
+
+        job, rest = self.find_job()
+        if job is None:
+            return
+
+        if self.server.service.cancel(job):
+            self.send_json(200, self.server.service.status(job))
+        else:
+            self.send_json(409, {'error': 'The job is no longer queued', **self.server.service.status(job)})
+
+    def log_message(self, format, *args):
+        # Clients poll a lot, logging every request would drown everything else
+        pass
+
+
+def serve(port=8765, workers=None, queue_size=64, token=None):
+    service = JobService(workers, queue_size)
+    server = ThreadingHTTPServer(('127.0.0.1', port), JobHandler)
+    server.service = service
+    server.token = token
+
+    # A plain kill shuts the workers down too
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    print(f'Serving {len(operations)} operations on http://127.0.0.1:{port} with {service.workers} workers')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+# Client side, for the GUI and batch.py
+
+def request(method, url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    headers = {'Content-Type': 'application/json'}
+    if os.environ.get('STEGA_TOKEN'):
+        headers['X-Stega-Token'] = os.environ['STEGA_TOKEN']
+
+    req = urllib.request.Request(url, data=data, method=method, headers=headers)
+
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def submit_job(operation, params, url=DEFAULT_URL):
+    """Returns the new job's id, or raises QueueFull if the service can't take more jobs right now."""
+    code, body = request('POST', f'{url}/jobs', {'operation': operation, 'params': params})
+
+    if code == 503:
+        raise QueueFull(body['error'])
+    if code != 202:
+        raise ValueError(body['error'])
+
+    return body['id']
+
+
+def job_status(job_id, url=DEFAULT_URL):
+    code, body = request('GET', f'{url}/jobs/{job_id}')
+    if code != 200:
+        raise KeyError(body['error'])
+
+    return body
+
+
+def wait_for_job(job_id, url=DEFAULT_URL, interval=0.05, timeout=None):
+    """Polls until the job is finished and returns its result, raises RuntimeError if it failed or was cancelled."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    while True:
+        status = job_status(job_id, url)
+        if status['status'] == 'done':
+            return resultFromJSON(request('GET', f'{url}/jobs/{job_id}/result')[1]['result'])
+        if status['status'] in ('failed', 'cancelled'):
+            raise RuntimeError(status.get('error', f'Job {job_id} was cancelled'))
+
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f'Job {job_id} is still {status["status"]}')
+        time.sleep(interval)
+
+
+def perform_task(operation, params, url=DEFAULT_URL, interval=0.05):
+    """Runs one api.py operation on the service and returns its result, waiting for room in the queue if needed."""
+    while True:
+        try:
+            job_id = submit_job(operation, params, url)
+            break
+        except QueueFull:
+            time.sleep(interval)
+
+    return wait_for_job(job_id, url, interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run api.py operations for local clients on a pool of worker processes.')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on, localhost only (default: 8765)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--queue-size', type=int, default=64, help='most jobs waiting or running at once (default: 64)')
+    parser.add_argument('--token', default=os.environ.get('STEGA_TOKEN'), help='require this token from clients (default: $STEGA_TOKEN, none if unset)')
+    args = parser.parse_args()
+
+    serve(args.port, args.workers, args.queue_size, args.token)
@@ -0,0 +1,249 @@
+#!/bin/python3
+
+# Command line batch mode over api.py
+# Runs one api function over every PNG in a directory, or over the jobs listed in a manifest,
+# spread over a pool of worker processes
+#
+# python3 batch.py hideTextInLSB --dir covers/ --text "Hello" --bit-depth 2 --output-dir out/
+# python3 batch.py getTextFromLSB --dir out/ --bit-depth 2 --report texts.jsonl
+# python3 batch.py --manifest jobs.jsonl --workers 8
+# python3 batch.py --manifest jobs.jsonl --server http://127.0.0.1:8765   (runs on the workers of back.py)
+#
+# A manifest has one JSON object per line: the operation name under "operation"
+# and the api function's parameters under their own names. Operations on more than one image
+# (mixColorChannels, mixTwoImagesMagic) can only run from a manifest, for example
+# {"operation": "mixColorChannels", "redImagePath": "r.png", "greenImagePath": "g.png", "blueImagePath": "b.png"}
+
+import os
+import sys
+import glob
+import json
+import base64
+import time
+import inspect
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import api
+
+
+operations = {
+	'hideTextInLSB': api.hideTextInLSB,
+	'getTextFromLSB': api.getTextFromLSB,
+	'getLSBCapacity': api.getLSBCapacity,
+	'mixTwoImagesMagic': api.mixTwoImagesMagic,
+	'mixColorChannels': api.mixColorChannels,
+	'separateColorChannels': api.separateColorChannels,
+	'hideTextByMakingImageLarger': api.hideTextByMakingImageLarger,
+	'getTextFromLargeImage': api.getTextFromLargeImage,
+}
+
+
+def inputFiles(params):
+	# Every parameter that names an image the operation reads
+	return [value for name, value in params.items() if name == 'fileName' or name.endswith('Path')]
+
+
+def resultToJSON(result):
+	# Extractions give back bytes when binary data was hidden, JSON has no bytes so they go as {"base64": ...}
+	if isinstance(result, (bytes, bytearray, memoryview)):
+		return {'base64': base64.b64encode(result).decode('ascii')}
+	if isinstance(result, (list, tuple)):
+		return [resultToJSON(item) for item in result]
+
+	return result
+
+
+def resultFromJSON(result):
+	# Inverse of resultToJSON
+	if isinstance(result, dict) and list(result) == ['base64']:
+		return base64.b64decode(result['base64'])
+	if isinstance(result, list):
+		return [resultFromJSON(item) for item in result]
+
+	return result
+
+
+def runJob(operation, params):
+	# Runs in a worker process. Errors are sent back instead of raised, so one bad file doesn't stop the batch
+	start = time.perf_counter()
+	try:
+		result, error = operations[operation](**params), None
+	except Exception as e:
+		result, error = None, f'{type(e).__name__}: {e}'
+
+	return result, error, time.perf_counter() - start
+
+
+def imageParameters(function):
+	# The parameters without a default, other than the text, are the input images
+	return [name for name, parameter in inspect.signature(function).parameters.items()
+		if parameter.default is inspect.Parameter.empty and name != 'text']
+
+
+def jobsFromDirectory(operation, directory, args):
+	# The first parameter of the api function gets the image, the rest come from the command line
+	function = operations[operation]
+	parameters = inspect.signature(function).parameters
+	inputName = next(iter(parameters))
+
+	jobs = []
+	for fileName in sorted(glob.glob(os.path.join(directory, '*.png'))):
+		params = {inputName: fileName}
+
+		if 'text' in parameters:
+			params['text'] = args.text
+		if 'bitDepth' in parameters and args.bit_depth is not None:
+			params['bitDepth'] = args.bit_depth
+		if 'streaming' in parameters and args.streaming:
+			params['streaming'] = True
+		if 'encoding' in parameters and args.encoding:
+			params['encoding'] = args.encoding
+		if 'compression' in parameters and args.compression:
+			params['compression'] = args.compression
+
+		if args.output_dir:
+			stem = os.path.splitext(os.path.basename(fileName))[0]
+			if 'outputFile' in parameters:
+				params['outputFile'] = os.path.join(args.output_dir, f'{stem}.png')
+			elif 'outputFiles' in parameters:
+				params['outputFiles'] = tuple(os.path.join(args.output_dir, f'{stem}-{color}.png') for color in ('red', 'green', 'blue'))
+
+		jobs.append((operation, params))
+
+	return jobs
+
+
+def jobsFromManifest(manifest, defaultOperation):
+	jobs = []
+	with open(manifest) as ifs:
+		for line in ifs:
+			if not line.strip():
+				continue
+
+			params = json.loads(line)
+			operation = params.pop('operation', defaultOperation)
+			if operation not in operations:
+				raise ValueError(f'Unknown operation in {manifest}: {operation}')
+
+			jobs.append((operation, params))
+
+	return jobs
+
+
+def runLocally(jobs, workers=None):
+	# Yields (operation, params, (result, error, seconds)) as the jobs finish
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		futures = {pool.submit(runJob, operation, params): (operation, params) for operation, params in jobs}
+
+		for future in as_completed(futures):
+			yield *futures[future], future.result()
+
+
+def runOnServer(jobs, url):
+	# Same as runLocally, on the job service of back.py
+	# Jobs are handed over as long as its queue takes them, the rest wait for room
+	# back.py imports this module, so it's only imported when it's needed
+	import back
+
+	waiting = list(jobs)
+	running = {}
+
+	while waiting or running:
+		while waiting:
+			operation, params = waiting[0]
+			try:
+				start = time.perf_counter()
+				running[back.submit_job(operation, params, url)] = (operation, params, start)
+			except back.QueueFull:
+				break
+			except ValueError as e:
+				yield operation, params, (None, f'{type(e).__name__}: {e}', 0.0)
+			waiting.pop(0)
+
+		for jobId, (operation, params, start) in list(running.items()):
+			status = back.job_status(jobId, url)
+			if status['status'] in ('queued', 'running'):
+				continue
+
+			del running[jobId]
+			if status['status'] == 'done':
+				result = resultFromJSON(back.request('GET', f'{url}/jobs/{jobId}/result')[1]['result'])
+				yield operation, params, (result, None, status['seconds'])
+			else:
+				yield operation, params, (None, status.get('error', status['status']), time.perf_counter() - start)
+
+		time.sleep(0.05)
+
+
+def runBatch(jobs, workers=None, report=None, server=None):
+	# Returns the list of finished jobs, in the order they finished
+	finished = []
+	# Missing inputs are left to fail in their own job
+	inputBytes = sum(os.path.getsize(f) for _, params in jobs for f in inputFiles(params) if os.path.exists(f))
+
+	start = time.perf_counter()
+	results = runOnServer(jobs, server) if server else runLocally(jobs, workers)
+	for operation, params, (result, error, seconds) in results:
+		what = ', '.join(os.path.basename(f) for f in inputFiles(params))
+		outcome = f'FAILED {error}' if error else repr(result)
+		print(f'{seconds:8.3f}s  {operation}  {what}  -> {outcome[:80]}')
+
+		finished.append({'operation': operation, 'params': params, 'result': result, 'error': error, 'seconds': seconds})
+
+	wall = time.perf_counter() - start
+	failed = sum(1 for job in finished if job['error'])
+
+	print(f'{len(finished)} jobs ({failed} failed) in {wall:.2f}s: {len(finished)/wall:.2f} jobs/s, {inputBytes/wall/2**20:.2f} MiB/s of input')
+
+	if report:
+		with open(report, 'w') as ofs:
+			for job in finished:
+				ofs.write(json.dumps({**job, 'result': resultToJSON(job['result'])}) + '\n')
+
+	return finished
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Run api.py operations over many images in parallel.')
+	parser.add_argument('operation', nargs='?', choices=sorted(operations), help='operation to run (optional with --manifest)')
+	source = parser.add_mutually_exclusive_group(required=True)
+	source.add_argument('--dir', help='run the operation on every .png in this directory')
+	source.add_argument('--manifest', help='file with one JSON job per line')
+	parser.add_argument('--text', help='text to hide')
+	parser.add_argument('--text-file', help='read the text to hide from this file')
+	parser.add_argument('--bit-depth', type=int, help='LSB bit depth')
+	parser.add_argument('--streaming', action='store_true', help='use the streaming, low memory mode where there is one')
+	parser.add_argument('--encoding', choices=sorted(api.encodePresets), help='how the results are compressed (default: pypng\'s usual settings)')
+	parser.add_argument('--compression', choices=['zlib', 'lzma'], help='compress the hidden text first (default: none)')
+	parser.add_argument('--output-dir', help='write results here, named after the inputs (default: unique temp files)')
+	parser.add_argument('--server', help='run the jobs on the back.py job service at this URL, e.g. http://127.0.0.1:8765')
+	parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+	parser.add_argument('--report', help='write every job and its result to this file, one JSON object per line')
+	args = parser.parse_args(argv)
+
+	if args.text_file:
+		with open(args.text_file) as ifs:
+			args.text = ifs.read()
+
+	if args.dir:
+		if not args.operation:
+			parser.error('an operation is needed with --dir')
+		if len(imageParameters(operations[args.operation])) > 1:
+			parser.error(f'{args.operation} takes more than one image, list its jobs in a --manifest instead of --dir')
+		if 'text' in inspect.signature(operations[args.operation]).parameters and args.text is None:
+			parser.error(f'{args.operation} needs --text or --text-file')
+		jobs = jobsFromDirectory(args.operation, args.dir, args)
+	else:
+		jobs = jobsFromManifest(args.manifest, args.operation)
+
+	if args.output_dir:
+		os.makedirs(args.output_dir, exist_ok=True)
+
+	finished = runBatch(jobs, args.workers, args.report, args.server)
+
+	return 1 if any(job['error'] for job in finished) else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,352 @@
+#!/bin/python3
+
+# Benchmarks every engine over synthetic covers
+# Covers are seeded, so every run measures the same images
+# For each operation, cover, bitDepth and encoding the fastest of --repeat runs is kept, together with
+# megapixels/s of cover, the size of what was written and the peak memory Python allocated
+# (tracemalloc, measured on a separate run)
+#
+# python3 benchmark.py
+# python3 benchmark.py --sizes 64x64 1920x1080 --planes 3 4 --bitdepths 8 --encodings fast small --output bench.json
+#
+# Payload compression is timed on its own, with log-like JSON payloads of growing size, to find from which
+# size on compressing is worth it
+#
+# Results are saved as JSON, so runs from different versions can be compared
+
+import os
+import sys
+import png
+import json
+import time
+import string
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+
+from pngTools import ImageResult, imageCache, encodePresets
+from payload import packPayload, compressions
+from magic import magic
+from lsb import putTextIntoLSB, getTheTextFromLSB, capacityOfLSB
+from colorChannels import combineColorChannels, separateChannels
+from enlargen import hideTextByEnlarging, getTheTextFromEnlarged
+
+
+sizes = {
+	'64x64': (64, 64),
+	'512x512': (512, 512),
+	'1080p': (1920, 1080),
+	'4K': (3840, 2160),
+	'8K': (7680, 4320),
+}
+
+planeNames = {1: 'grey', 2: 'grey+alpha', 3: 'RGB', 4: 'RGBA'}
+
+lsbDepths = tuple(range(1, 9))
+
+# Payload sizes for the compression runs, as many of them as fit
+payloadSizes = tuple(2**n for n in range(6, 21, 2))
+
+
+def parseSize(size):
+	# Either one of the names above or WIDTHxHEIGHT
+	if size in sizes:
+		return size, sizes[size]
+
+	w, h = size.lower().split('x')
+	return size, (int(w), int(h))
+
+
+def makeCover(fileName, w, h, planes, bitdepth, seed=0):
+	# Smooth gradients with a little sensor-like noise on top, so the PNG filters and zlib levels
+	# make about as much of a difference as they would on a photo
+	rng = np.random.default_rng(seed)
+	top = 2**bitdepth - 1
+	y, x = np.mgrid[0:h, 0:w]
+
+	red, green, blue = x*top // w, y*top // h, (x+y)*top // (w+h)
+	alpha = np.full((h, w), top)
+	channels = {1: [blue], 2: [blue, alpha], 3: [red, green, blue], 4: [red, green, blue, alpha]}[planes]
+	pixels = np.stack(channels, axis=2)
+
+	noise = rng.integers(-(top//64), top//64 + 1, pixels.shape)
+	pixels = np.clip(pixels + noise, 0, top).astype(np.uint16 if bitdepth > 8 else np.uint8).reshape(h, w*planes)
+
+	return ImageResult(pixels, planes, bitdepth).save(fileName)
+
+
+def randomText(length, seed=0):
+	rng = np.random.default_rng(seed)
+	alphabet = np.frombuffer((string.ascii_letters + string.digits + ' ').encode(), dtype=np.uint8)
+
+	return rng.choice(alphabet, max(length, 0)).tobytes().decode('ascii')
+
+
+def logText(length, seed=0):
+	# JSON log lines, the kind of payload that compresses 5-10x
+	rng = np.random.default_rng(seed)
+	levels = ('DEBUG', 'INFO', 'INFO', 'INFO', 'WARNING', 'ERROR')
+	messages = ('request served', 'cache miss', 'retrying upstream call', 'user logged in', 'slow query', 'connection reset by peer')
+
+	lines = []
+	size = 0
+	while size < length:
+		seconds = int(rng.integers(0, 86400))
+		line = json.dumps({
+			'time': f'2024-05-01T{seconds//3600:02}:{seconds//60%60:02}:{seconds%60:02}Z',
+			'level': levels[rng.integers(len(levels))],
+			'message': messages[rng.integers(len(messages))],
+			'request': int(rng.integers(1, 10**6)),
+			'ms': round(float(rng.exponential(40)), 1),
+		}) + '\n'
+		lines.append(line)
+		size += len(line)
+
+	return ''.join(lines)[:length]
+
+
+def casesFor(cover, w, h, planes, bitdepth, work, fill, encodings):
+	# Yields (operation, bitDepth, encoding, function) in order, every extraction comes right after the embedding it reads
+	# Operations that write get one case per encoding, the ones that only read get encoding None
+	# Default arguments pin the loop variables, the functions are called after the loop moved on
+	for bitDepth in lsbDepths:
+		text = randomText(int(capacityOfLSB(cover, bitDepth)*fill))
+		stego = os.path.join(work, f'lsb-{bitDepth}.png')
+
+		for e in encodings:
+			yield 'putTextIntoLSB', bitDepth, e, lambda t=text, d=bitDepth, s=stego, e=e: putTextIntoLSB(cover, t, d, s, encoding=e)
+			yield 'putTextIntoLSB(streaming)', bitDepth, e, lambda t=text, d=bitDepth, s=stego, e=e: putTextIntoLSB(cover, t, d, s, streaming=True, encoding=e)
+		# Bands on every CPU, only the embedding changes so one encoding is enough
+		yield 'putTextIntoLSB(tiled)', bitDepth, encodings[0], lambda t=text, d=bitDepth, s=stego, e=encodings[0]: putTextIntoLSB(cover, t, d, s, encoding=e, workers=None)
+		yield 'getTheTextFromLSB', bitDepth, None, lambda d=bitDepth, s=stego: getTheTextFromLSB(s, d)
+
+	# One char per subpixel
+	text = randomText(int(w*h*planes*fill))
+	enlarged = os.path.join(work, 'enlarged.png')
+
+	for e in encodings:
+		yield 'hideTextByEnlarging', None, e, lambda e=e: hideTextByEnlarging(cover, text, enlarged, encoding=e)
+		yield 'hideTextByEnlarging(streaming)', None, e, lambda e=e: hideTextByEnlarging(cover, text, enlarged, streaming=True, encoding=e)
+	yield 'getTheTextFromEnlarged', None, None, lambda: getTheTextFromEnlarged(enlarged)
+
+	for e in encodings:
+		yield 'combineColorChannels', None, e, lambda e=e: combineColorChannels(cover, cover, cover, os.path.join(work, 'combined.png'), encoding=e)
+
+		# Splitting only makes sense when there are colors to split
+		if planes >= 3:
+			outputs = tuple(os.path.join(work, f'{color}.png') for color in ('red', 'green', 'blue'))
+			yield 'separateChannels', None, e, lambda e=e: separateChannels(cover, outputs, encoding=e)
+
+		# magic only reads 8 bit RGBA
+		if planes == 4 and bitdepth == 8:
+			yield 'magic', None, e, lambda e=e: magic(cover, cover, os.path.join(work, 'magic.png'), encoding=e)
+
+
+def outputBytes(result):
+	# Writers return the path, or the paths, of what they wrote
+	paths = (result,) if isinstance(result, str) else result
+
+	return sum(os.path.getsize(path) for path in paths)
+
+
+def timeIt(function, repeat):
+	# Returns the best time, and what the function returned
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		result = function()
+		seconds = time.perf_counter() - start
+		best = seconds if best is None else min(best, seconds)
+
+	return best, result
+
+
+def peakMemory(function):
+	# tracemalloc slows pure Python code down a lot, so it gets its own run
+	tracemalloc.start()
+	try:
+		function()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def environment():
+	try:
+		commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+	except OSError:
+		commit = ''
+
+	return {
+		'commit': commit or None,
+		'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+		'python': platform.python_version(),
+		'numpy': np.__version__,
+		'pypng': getattr(png, '__version__', None),
+		'machine': platform.machine(),
+		'system': platform.platform(),
+		'cpus': os.cpu_count(),
+	}
+
+
+def runBenchmark(sizeNames, planeCounts, bitdepths, repeat=3, fill=0.5, memory=True, only=None, encodings=('default',), report=print):
+	results = []
+
+	with tempfile.TemporaryDirectory(prefix='stega-bench-') as work:
+		for sizeName in sizeNames:
+			sizeName, (w, h) = parseSize(sizeName)
+
+			for planes in planeCounts:
+				for bitdepth in bitdepths:
+					cover = makeCover(os.path.join(work, 'cover.png'), w, h, planes, bitdepth)
+					megapixels = w*h / 1e6
+
+					for operation, bitDepth, encoding, function in casesFor(cover, w, h, planes, bitdepth, work, fill, encodings):
+						if only and operation not in only:
+							# Extractions still need their input
+							if not operation.startswith('get'):
+								function()
+							continue
+
+						seconds, returned = timeIt(function, repeat)
+						result = {
+							'operation': operation,
+							'size': sizeName,
+							'width': w,
+							'height': h,
+							'planes': planes,
+							'color': planeNames[planes],
+							'bitdepth': bitdepth,
+							'bitDepth': bitDepth,
+							'encoding': encoding,
+							'megapixels': megapixels,
+							'seconds': seconds,
+							'megapixelsPerSecond': megapixels / seconds,
+							'outputBytes': outputBytes(returned) if encoding else None,
+							'peakMemoryBytes': peakMemory(function) if memory else None,
+						}
+						results.append(result)
+
+						if report:
+							report(formatResult(result))
+
+	return results
+
+
+def runCompressionBenchmark(sizeName, repeat=3, report=print):
+	# Embeds and extracts log text of every size in payloadSizes, with and without compression,
+	# at bitDepth 1 in an 8 bit RGBA cover
+	# Embedding decodes and encodes the whole image either way, extraction only decodes the rows the payload is in,
+	# so that's where a smaller payload saves time
+	sizeName, (w, h) = parseSize(sizeName)
+	methods = (None,) + tuple(compressions)
+	results = []
+
+	with tempfile.TemporaryDirectory(prefix='stega-bench-') as work:
+		cover = makeCover(os.path.join(work, 'cover.png'), w, h, 4, 8)
+		stego = os.path.join(work, 'stego.png')
+		capacity = capacityOfLSB(cover)
+
+		for size in payloadSizes:
+			text = logText(size)
+
+			for method in methods:
+				hidden = len(packPayload(text, method))
+				if hidden > capacity:
+					continue
+
+				embedSeconds = timeIt(lambda: putTextIntoLSB(cover, text, 1, stego, compression=method), repeat)[0]
+				extractSeconds, extracted = timeIt(lambda: getTheTextFromLSB(stego, 1), repeat)
+				assert extracted == text
+
+				result = {
+					'size': sizeName,
+					'payloadBytes': size,
+					'compression': method,
+					'hiddenBytes': hidden,
+					'ratio': size / hidden,
+					'rowsTouched': -(-hidden*8 // (w*4)),
+					'embedSeconds': embedSeconds,
+					'extractSeconds': extractSeconds,
+				}
+				results.append(result)
+
+				if report:
+					report(f'{method or "none":6} {size:8} B -> {hidden:8} B hidden {result["ratio"]:6.2f}x {result["rowsTouched"]:6} rows'
+						f'   embed {embedSeconds:8.3f}s   extract {extractSeconds:8.3f}s')
+
+	return {'results': results, 'breakEven': breakEven(results)}
+
+
+def breakEven(results):
+	# For every compression, the smallest payload from which on it hides fewer bytes than no compression,
+	# and from which on it extracts at least as fast. None if it never does
+	plain = {r['payloadBytes']: r for r in results if r['compression'] is None}
+	points = {}
+
+	for method in compressions:
+		rows = [r for r in results if r['compression'] == method and r['payloadBytes'] in plain]
+
+		def firstFrom(better):
+			# The payload size after which compression stays better
+			since = None
+			for r in rows:
+				since = (since or r['payloadBytes']) if better(r, plain[r['payloadBytes']]) else None
+			return since
+
+		points[method] = {
+			'smallerFrom': firstFrom(lambda r, p: r['hiddenBytes'] < p['hiddenBytes']),
+			'fasterFrom': firstFrom(lambda r, p: r['extractSeconds'] <= p['extractSeconds']),
+		}
+
+	return points
+
+
+def formatResult(result):
+	depth = f'd={result["bitDepth"]}' if result['bitDepth'] else ''
+	encoding = result['encoding'] or ''
+	size = f'{result["outputBytes"]/2**20:9.2f} MiB out' if result['outputBytes'] is not None else ' '*17
+	memory = f'{result["peakMemoryBytes"]/2**20:9.1f} MiB peak' if result['peakMemoryBytes'] is not None else ''
+
+	return (f'{result["operation"]:32} {result["size"]:>9} {result["color"]:>10} {result["bitdepth"]:2}bit {depth:4} {encoding:7}'
+		f' {result["seconds"]:9.3f}s {result["megapixelsPerSecond"]:8.2f} MP/s {size} {memory}')
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Benchmark the engines on synthetic covers.')
+	parser.add_argument('--sizes', nargs='+', default=list(sizes), help=f'cover sizes, WIDTHxHEIGHT or one of {", ".join(sizes)} (default: all of those)')
+	parser.add_argument('--planes', nargs='+', type=int, choices=sorted(planeNames), default=sorted(planeNames), help='1 grey, 2 grey+alpha, 3 RGB, 4 RGBA (default: all)')
+	parser.add_argument('--bitdepths', nargs='+', type=int, choices=(8, 16), default=[8, 16], help='cover bit depths (default: 8 and 16)')
+	parser.add_argument('--operations', nargs='+', help='only time these operations (default: all)')
+	parser.add_argument('--encodings', nargs='+', choices=list(encodePresets), default=list(encodePresets), help='encoding presets to time the writers with (default: all)')
+	parser.add_argument('--repeat', type=int, default=3, help='runs per case, the fastest counts (default: 3)')
+	parser.add_argument('--fill', type=float, default=0.5, help='how much of the capacity the hidden text uses (default: 0.5)')
+	parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+	parser.add_argument('--cache', action='store_true', help='keep the decoded image cache on, so repeated runs skip decoding')
+	parser.add_argument('--compression-size', default='1080p', help='cover size for the payload compression runs (default: 1080p)')
+	parser.add_argument('--no-compression', action='store_true', help='skip the payload compression runs')
+	parser.add_argument('--output', default='benchmark.json', help='where to save the results (default: benchmark.json)')
+	args = parser.parse_args(argv)
+
+	if not args.cache:
+		imageCache.setLimit(0)
+
+	results = runBenchmark(args.sizes, args.planes, args.bitdepths, args.repeat, args.fill, not args.no_memory, args.operations, args.encodings)
+	saved = {'environment': environment(), 'settings': vars(args), 'results': results}
+
+	if not args.no_compression:
+		saved['compression'] = runCompressionBenchmark(args.compression_size, args.repeat)
+		for method, points in saved['compression']['breakEven'].items():
+			print(f'{method}: hides fewer bytes from {points["smallerFrom"]} B of payload on, extracts faster from {points["fasterFrom"]} B on')
+
+	with open(args.output, 'w') as ofs:
+		json.dump(saved, ofs, indent=1)
+
+	print(f'{len(results)} results saved to {args.output}')
+
+
+if __name__ == '__main__':
+	sys.exit(main())
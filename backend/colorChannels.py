@@ -1,111 +1,122 @@
 #!/bin/python3
 
-import png
 import string
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
+from pngTools import readImage, openOutput, newOutputFile, Progress, ImageResult
 
-def combineColorChannels(redImagePath: string, greenImagePath: string, blueImagePath: string, resultFile: string = 'res.png'):
 
+# Turn the pixels of a source image (h x w x planes) into a single plane
+planeAdapters = {
+	1: lambda pixels: pixels[:, :, 0], # grey
+	2: lambda pixels: pixels[:, :, 0], # grey + alpha, alpha is dropped
+	3: lambda pixels: pixels.sum(axis=2, dtype=np.uint32)//3, # RGB, average of the colors
+	4: lambda pixels: pixels[:, :, :3].sum(axis=2, dtype=np.uint32)//3, # RGBA, alpha is dropped
+}
 
-	with open(redImagePath, 'rb') as ifsr, open(greenImagePath, 'rb') as ifsg, open(blueImagePath, 'rb') as ifsb:
 
+def toSinglePlane(fileName, tracker):
+	pixels, info = readImage(fileName, tracker)
+	planes = info['planes']
 
-		rpng = png.Reader(file=ifsr).read()
-		gpng = png.Reader(file=ifsg).read()
-		bpng = png.Reader(file=ifsb).read()
+	with tracker.stats.stage('transform'):
+		plane = planeAdapters[planes](pixels.reshape(pixels.shape[0], -1, planes))
 
-		w, h = rpng[:2] # we're assuming they're the same size
+	return plane, info['bitdepth']
 
 
-		rl = list(rpng[2])
-		gl = list(gpng[2])
-		bl = list(bpng[2])
+def combineImages(redImagePath, greenImagePath, blueImagePath, tracker):
+	# Each source becomes one channel of the result
+	red, rbitdepth = toSinglePlane(redImagePath, tracker)
+	green, gbitdepth = toSinglePlane(greenImagePath, tracker)
+	blue, bbitdepth = toSinglePlane(blueImagePath, tracker)
 
-		rchannels = rpng[3]['planes']
-		gchannels = gpng[3]['planes']
-		bchannels = bpng[3]['planes']
+	h, w = red.shape # we're assuming they're the same size
 
+	bitdepth = max(rbitdepth, gbitdepth, bbitdepth)
+	dtype = np.uint16 if bitdepth > 8 else np.uint8
 
-		data = []
-		for y in range(h):
-			datarow = []
-			for x in range(w):
-				for i in range(3):
+	with tracker.stats.stage('transform'):
+		# Sources with fewer bits are scaled up to the result's, so 255 in an 8 bit source is 65535 next to a 16 bit one
+		planes = [plane.astype(dtype) * dtype((2**bitdepth-1) // (2**depth-1))
+			for plane, depth in ((red, rbitdepth), (green, gbitdepth), (blue, bbitdepth))]
+		data = np.stack(planes, axis=2).reshape(h, w*3)
 
-					channels, bits = None, None
+	# output is definitely 3 channels
+	return ImageResult(data, 3, bitdepth)
 
-					if i % 3 == 0:
-						channels = rchannels
-						bits = rl[y]
-					elif i % 3 == 1:
-						channels = gchannels
-						bits = gl[y]
-					elif i % 3 == 2:
-						channels = bchannels
-						bits = bl[y]
 
-					if channels == 1:
-						datarow += [bits[x]]
-					elif channels == 2:
-						datarow += [bits[2*x]]
-					elif channels == 3:
-						s = sum(bits[3*x:3*x+3])//3
-						datarow += [s]
-					elif channels == 4:
-						s = sum(bits[4*x:4*x+3])//3
-						datarow += [s]
+def combineColorChannelsInMemory(redImagePath: string, greenImagePath: string, blueImagePath: string, progress = None, stats = None):
+	# Nothing is written, the result is encoded only when asked for
+	tracker = Progress(progress, stats=stats)
+	result = combineImages(redImagePath, greenImagePath, blueImagePath, tracker)
+	tracker.finish()
 
-			data += [datarow]
-			datarow = []
+	return result
 
-	
-	with open(resultFile, "wb") as ofs:
-		# output is definitely 3 channels
-		writer = png.Writer(w,h, greyscale=False, alpha=False)
-		writer.write(ofs, data)
 
+def combineColorChannels(redImagePath: string, greenImagePath: string, blueImagePath: string, resultFile: string = None, progress = None, stats = None, encoding = None):
+
+	if resultFile is None:
+		resultFile = newOutputFile('rgb')
+
+	# Three images are decoded and one is encoded
+	tracker = Progress(progress, passes=4, stats=stats)
+
+	result = combineImages(redImagePath, greenImagePath, blueImagePath, tracker)
+
+	with openOutput(resultFile) as ofs:
+		result.write(ofs, tracker, encoding)
+
+	tracker.finish()
 
 	return resultFile
 
-def separateChannels(mixedFileName, outputFiles = ("resRed.png", "resGreen.png", "resBlue.png")):
+def separateImage(mixedFileName, tracker):
+	bits, info = readImage(mixedFileName, tracker)
+
+	planes = info['planes']
+	if planes < 3:
+		raise ValueError(f'The image has {planes} channel{"s" if planes > 1 else ""}, it needs red, green and blue to be separated.')
+
+	# Every channel is a strided view of the same buffer, nothing is copied
+	return [ImageResult(bits[:, i::planes], 1, info['bitdepth']) for i in range(3)]
 
-	with open(mixedFileName, 'rb') as ifs:
 
-		mpng = png.Reader(file=ifs).read()
+def separateChannelsInMemory(mixedFileName, progress = None, stats = None):
+	# Nothing is written, the results are encoded only when asked for
+	tracker = Progress(progress, stats=stats)
+	results = separateImage(mixedFileName, tracker)
+	tracker.finish()
 
+	return results
 
-		w, h = mpng[:2] # we're assuming they're the same size
 
-		rdata = []
-		gdata = []
-		bdata = []
+def writeChannel(fileName, result, tracker, encoding=None):
+	with openOutput(fileName) as ofs:
+		result.write(ofs, tracker, encoding)
 
-		bits = list(mpng[2])
+	return fileName
 
 
-		for y in range(h):
-			rrow = []
-			grow = []
-			brow = []
-			for x in range(w):
+def separateChannels(mixedFileName, outputFiles = None, progress = None, stats = None, encoding = None):
 
-				rrow += [bits[y][3*x]]
-				grow += [bits[y][3*x+1]]
-				brow += [bits[y][3*x+2]]
+	if outputFiles is None:
+		outputFiles = (newOutputFile('red'), newOutputFile('green'), newOutputFile('blue'))
 
-			rdata += [rrow]
-			gdata += [grow]
-			bdata += [brow]
+	# One image is decoded and three are encoded
+	tracker = Progress(progress, passes=4, stats=stats)
 
+	results = separateImage(mixedFileName, tracker)
 
-		for fileName, data in zip(outputFiles, [rdata, gdata, bdata]):
-			with open(fileName, "wb") as ofs:
-				# output is definitely 3 channels
-				writer = png.Writer(w,h, greyscale=True, alpha=False)
-				writer.write(ofs, data)
+	# zlib lets go of the GIL while compressing, so the three encodes overlap
+	with ThreadPoolExecutor(max_workers=3) as pool:
+		list(pool.map(writeChannel, outputFiles, results, [tracker]*3, [encoding]*3))
 
+	tracker.finish()
 
 	return outputFiles
 if __name__ == "__main__":
-	combineColorChannels("ex1.png", "ex2.png", "ex3.png")
-	separateChannels('res.png')
+	res = combineColorChannels("ex1.png", "ex2.png", "ex3.png")
+	separateChannels(res)
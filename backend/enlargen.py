@@ -2,123 +2,188 @@
 
 import png
 import string
+import numpy as np
 
+from pngTools import rowToArray, readImage, imageRows, openImage, openOutput, makeWriter, newOutputFile, Progress, ImageResult
+from payload import HEADER_SIZE, packPayload, legacyCodes, PayloadReader
 
-def hideTextByEnlarging(inputFile: string, text: string, resultFile: string = 'res.png'):
 
-	def generator_function():
-		for c in text:
-			yield ord(c)
-		while True:
-			yield 0
-	
-	gen = generator_function()
+def payloadCodes(text, legacy=False, compression=None):
+	# One code per subpixel: a byte of the container, or in the legacy format a char
+	# Only the lowest 9 bits of a char fit into the three 3 bit slices
+	if legacy:
+		return legacyCodes(text, 0x1FF, compression).astype(np.uint16)
 
-	def processBlock(block, chars, chans):
-		mask = 7
+	return np.frombuffer(packPayload(text, compression), dtype=np.uint8).astype(np.uint16)
 
-		tl = block.copy()
-		tr = block.copy()
-		bl = block.copy()
-		br = block.copy()
 
-		for i, char in enumerate(chars):
-			tr[i] = (tr[i]>>3<<3) + (char & mask)  
-			bl[i] = (bl[i]>>3<<3) + ((char>>3) & mask)  
-			br[i] = (br[i]>>3<<3) + ((char>>6) & mask)  
+def checkEnlargeCapacity(room, codes, legacy=False):
+	# A legacy text is cut off where the image ends, the container has to fit whole
+	if not legacy and codes.size > room:
+		raise ValueError(f'The payload is {codes.size - HEADER_SIZE} bytes long, but the image can only hold {max(0, room - HEADER_SIZE)}.')
 
-		return tl+tr, bl+br
 
+def padCodes(codes, size):
+	# Zeros once the payload runs out, they also end a legacy text
+	padded = np.zeros(size, dtype=np.uint16)
+	padded[:min(size, codes.size)] = codes[:size]
 
+	return padded
 
 
+def enlargeWithCodes(imgBits, planes, chars):
+	# imgBits has one row per image row, planes*w values each
+	# chars has the same shape, one char per subpixel
+	# Every pixel becomes a 2x2 block:
+	# top left is the original, the other three carry 3 bits of a char each
+	h, rowLen = imgBits.shape
+	w = rowLen // planes
+	mask = 7
 
-	with open(inputFile, 'rb') as ifs:
+	pixels = imgBits.reshape(h, w, planes)
+	chars = chars.reshape(h, w, planes)
+	cleared = pixels >> 3 << 3
 
+	blocks = np.empty((h, 2, w, 2, planes), dtype=imgBits.dtype)
+	blocks[...] = pixels[:, None, :, None, :]
 
-		rpng = png.Reader(file=ifs).read()
+	blocks[:, 0, :, 1] = cleared | (chars & mask)  # top right
+	blocks[:, 1, :, 0] = cleared | ((chars>>3) & mask)  # bottom left
+	blocks[:, 1, :, 1] = cleared | ((chars>>6) & mask)  # bottom right
 
-		w, h = rpng[:2] # we're assuming they're the same size
+	return blocks.reshape(2*h, 2*rowLen)
 
 
-		rl = list(rpng[2])
+def enlargeWithText(imgBits, planes, codes):
+	chars = padCodes(codes, imgBits.size).reshape(imgBits.shape)
 
-		rchannels = rpng[3]['planes']
+	return enlargeWithCodes(imgBits, planes, chars)
+
+
+def enlargeRowsWithText(rows, info, codes):
+	# Same as enlargeWithText, but takes one row at a time and yields two
+	planes = info['planes']
+
+	start = 0
+	for row in rows:
+		imgBits = rowToArray(row, info).reshape(1, -1)
+
+		chars = np.zeros(imgBits.shape, dtype=np.uint16)
+		part = codes[start:start+imgBits.size]
+		chars[0, :part.size] = part
+		start += imgBits.size
+
+		yield from enlargeWithCodes(imgBits, planes, chars)
+
+
+def enlargeImage(inputFile, text, tracker, legacy=False, compression=None):
+	codes = payloadCodes(text, legacy, compression)
+	rl, info = readImage(inputFile, tracker)
+	checkEnlargeCapacity(rl.size, codes, legacy)
+
+	with tracker.stats.stage('transform'):
+		data = enlargeWithText(rl, info['planes'], codes)
+
+	return ImageResult(data, info['planes'], info['bitdepth'])
+
+
+def hideTextByEnlargingInMemory(inputFile: string, text: string, progress = None, stats = None, legacy = False, compression = None):
+	# Nothing is written, the result is encoded only when asked for
+	tracker = Progress(progress, stats=stats)
+	result = enlargeImage(inputFile, text, tracker, legacy, compression)
+	tracker.finish()
 
+	return result
 
-		data = []
-		for y in range(h):
-			uprow = []
-			downrow = []
-			for x in range(w):
-				block = rl[y][x*rchannels:(x+1)*rchannels]
 
-				chars = [next(gen) for _ in range(rchannels)]
+def hideTextByEnlarging(inputFile: string, text: string, resultFile: string = None, streaming: bool = False, progress = None, stats = None, encoding = None, legacy = False, compression = None):
+	# text is a str or bytes. legacy hides it in the old zero terminated format, for earlier versions to read
+	# compression ('zlib' or 'lzma') shrinks it first, so it takes fewer subpixels
+	if resultFile is None:
+		resultFile = newOutputFile('enlarged')
 
+	if not streaming:
+		# Source rows are counted when decoded, the twice as many output rows when encoded
+		tracker = Progress(progress, passes=3, stats=stats)
+		result = enlargeImage(inputFile, text, tracker, legacy, compression)
 
-# 				print(x, list(block), chars)
-				# input()
+		with openOutput(resultFile) as ofs:
+			result.write(ofs, tracker, encoding)
 
-				top, bottom = processBlock(block, chars, rchannels)
-				uprow += top
-				downrow += bottom
+		tracker.finish()
+		return resultFile
 
-			data += [uprow, downrow]
+	tracker = Progress(progress, stats=stats)
+	stats = tracker.stats
+	codes = payloadCodes(text, legacy, compression)
 
-	
-	with open(resultFile, "wb") as ofs:
-		# output is definitely 3 channels
-		writer = png.Writer(w,h, greyscale=False, alpha=False)
+	with openImage(inputFile) as ifs:
 
 
-		if rchannels == 1:
-			writer = png.Writer(w*2,h*2, greyscale=True, alpha=False)
-		elif rchannels == 2:
-			writer = png.Writer(w*2,h*2, greyscale=True, alpha=True)
-		elif rchannels == 3:
-			writer = png.Writer(w*2,h*2, greyscale=False, alpha=False)
-		elif rchannels == 4:
-			writer = png.Writer(w*2,h*2, greyscale=False, alpha=True)
-		writer.write(ofs, data)
+		rpng = png.Reader(file=stats.file(ifs)).read()
 
-		writer.write(ofs, data)
+		w, h = rpng[:2] # we're assuming they're the same size
+
+		rchannels = rpng[3]['planes']
+		checkEnlargeCapacity(w*h*rchannels, codes, legacy)
+
+		writer = makeWriter(w*2, h*2, rchannels, rpng[3]['bitdepth'], encoding)
+
+		tracker.start(h)
+
+		# Each source row is written out as two rows as soon as it's decoded
+		rows = stats.rows(tracker.rows(rpng[2]), 'decode')
+		rows = stats.rows(enlargeRowsWithText(rows, rpng[3], codes), 'transform')
+
+		with openOutput(resultFile) as ofs, stats.stage('encode'):
+			writer.write(stats.file(ofs), rows)
+
+	stats.add(pixelsRead=w*h, pixelsWritten=4*w*h)
+	tracker.finish()
 
 	return resultFile
 
-def getTheTextFromEnlarged(fileName):
-	with open(fileName, 'rb') as ifs:
-		thePNG = png.Reader(file=ifs).read()
-		
-		h = thePNG[1]
-		w = thePNG[0]
-		planes = thePNG[3]["planes"]
-		imgBits = list(thePNG[2]) # list of rows. Each row is 3x width if 3 color channels. 4 with alpha. 1 if grayscale
+def codesFromBlocks(top, bottom, planes):
+	# top and bottom are one pair of rows of the enlarged image
+	# Gives back the char of every subpixel of the 2x2 blocks in them
+	mask = 7
+	blocks = top.size // (2*planes)
+
+	top = top[:blocks*2*planes].reshape(blocks, 2, planes).astype(np.uint16)
+	bottom = bottom[:blocks*2*planes].reshape(blocks, 2, planes).astype(np.uint16)
+
+	chars = (top[:, 1] & mask) | ((bottom[:, 0] & mask)<<3) | ((bottom[:, 1] & mask)<<6)
+
+	return chars.ravel()
+
+
+def getTheTextFromEnlarged(fileName, progress=None, stats=None):
+	tracker = Progress(progress, stats=stats)
+	stats = tracker.stats
 
+	with imageRows(fileName, stats) as thePNG, stats.stage('transform'):
+		info = thePNG[3]
+		planes = info["planes"]
+		tracker.start(thePNG[1])
+		rows = iter(tracker.rows(stats.rows(thePNG[2], 'decode')))
 
-		res = ""		
-		for y in range(0, h, 2):
-			for x in range(0, w, 2):
-				topBlock = imgBits[y][x*planes:(x+2)*planes]
-				botBlock = imgBits[y+1][x*planes:(x+2)*planes]
+		payload = PayloadReader((thePNG[0]//2) * (thePNG[1]//2) * planes)
 
-				tl = topBlock[:planes]
-				tr = topBlock[planes:]
-				bl = botBlock[:planes]
-				br = botBlock[planes:]
+		# Rows are decoded a pair at a time, so we stop decoding once the payload is complete
+		for topRow in rows:
+			botRow = next(rows, None)
+			if botRow is None:
+				break
 
+			stats.add(pixelsRead=2*thePNG[0])
+			if payload.feed(codesFromBlocks(rowToArray(topRow, info), rowToArray(botRow, info), planes)):
+				break
 
-				mask = 7
-				for i in range(planes):
-					ch = 0
-					ch += tr[i] & mask
-					ch += (((bl[i]) & mask)<<3)
-					ch += (((br[i]) & mask)<<6)
+		text = payload.result()
 
-					if ch == 0:
-						return res
+	tracker.finish()
 
-					res += chr(ch)
-	return res
+	return text
 
 
 
@@ -128,7 +193,7 @@ def getTheTextFromEnlarged(fileName):
 
 
 if __name__ == "__main__":
-	hideTextByEnlarging('ex1.png', "Hello world")
-	getTheTextFromEnlarged('res.png')
+	res = hideTextByEnlarging('ex1.png', "Hello world")
+	getTheTextFromEnlarged(res)
 
 
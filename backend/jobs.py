@@ -0,0 +1,137 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QProgressBar, QPushButton,
+                             QMessageBox)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once the user asked to cancel it."""
+
+
+class JobSignals(QObject):
+    # QRunnable is not a QObject, so the signals live here
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Job(QRunnable):
+    """Runs one api.py function on the shared thread pool, off the Qt event thread."""
+
+    def __init__(self, function, *args, **kwargs):
+        super().__init__()
+        # The tab keeps a reference to the job, Qt must not delete it under us
+        self.setAutoDelete(False)
+
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self.cancel_requested = threading.Event()
+        self.last_percent = -1
+
+    def cancel(self):
+        self.cancel_requested.set()
+
+    def report_progress(self, done, total):
+        # Called by the engine on the worker thread, raising here stops it
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+        percent = 100 * done // total if total else 100
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.signals.progress.emit(percent)
+
+    def run(self):
+        try:
+            result = self.function(*self.args, progress=self.report_progress, **self.kwargs)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+class JobControls(QWidget):
+    """Progress bar and cancel button for the job a tab is running."""
+
+    def __init__(self, start_button, status_label, *other_buttons):
+        super().__init__()
+        # The start button and the other buttons (like Download) are disabled while a job runs,
+        # the status label tells how it ended
+        self.buttons = (start_button, *other_buttons)
+        self.status_label = status_label
+        self.job = None
+        self.running = False
+        self.was_enabled = []
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setFixedSize(300, 30)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setFixedSize(100, 30)
+        self.cancel_button.setToolTip("Stop the running operation")
+        self.cancel_button.clicked.connect(self.cancel)
+
+        layout = QHBoxLayout(self)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.cancel_button)
+        self.hide()
+
+    def start(self, function, *args, on_finished=None, **kwargs):
+        # on_finished gets the function's result, back on the Qt event thread
+        # One job at a time, it would otherwise take over the running job's signals
+        if self.running:
+            return False
+
+        self.running = True
+        self.job = Job(function, *args, **kwargs)
+        self.job.signals.progress.connect(self.progress_bar.setValue)
+        # Every job keeps its own callback, whatever gets started later
+        self.job.signals.finished.connect(lambda result: self.job_finished(result, on_finished))
+        self.job.signals.failed.connect(self.job_failed)
+        self.job.signals.cancelled.connect(self.job_cancelled)
+
+        self.progress_bar.setValue(0)
+        self.cancel_button.setEnabled(True)
+        self.was_enabled = [button.isEnabled() for button in self.buttons]
+        for button in self.buttons:
+            button.setEnabled(False)
+        self.status_label.setText("Working...")
+        self.show()
+
+        QThreadPool.globalInstance().start(self.job)
+        return True
+
+    def cancel(self):
+        if self.job and self.cancel_button.isEnabled():
+            self.job.cancel()
+            self.cancel_button.setEnabled(False)
+            self.status_label.setText("Cancelling...")
+
+    def job_done(self):
+        # The job itself is kept until the next one starts, its thread may still be returning
+        # The start button is always usable again, the others go back to how they were
+        self.running = False
+        for button, enabled in zip(self.buttons, [True, *self.was_enabled[1:]]):
+            button.setEnabled(enabled)
+        self.hide()
+
+    def job_finished(self, result, on_finished):
+        self.job_done()
+        if on_finished:
+            on_finished(result)
+
+    def job_failed(self, message):
+        self.job_done()
+        self.status_label.setText("Operation failed.")
+        QMessageBox.critical(self, "Error", message)
+
+    def job_cancelled(self):
+        self.job_done()
+        self.status_label.setText("Operation cancelled.")
@@ -1,105 +1,388 @@
 #!/bin/python3
 
+import os
 import png
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-def putTextIntoLSB(fileName, text, bitDepth=1, outputFile = 'res.png'):
-	with open(fileName, 'rb') as ifs:
-		thePNG = png.Reader(file=ifs).read()
+from pngTools import pixelType, rowToArray, readImage, imageRows, openImage, openOutput, isPath, makeWriter, newOutputFile, Progress, ImageResult
+from payload import HEADER_SIZE, packPayload, legacyCodes, PayloadReader
 
-		h = thePNG[1]
-		w = thePNG[0]
-		planes = thePNG[3]["planes"]
-		imgBits = list(thePNG[2]) # list of rows. Each row is 3x width if 3 color channels. 4 with alpha. 1 if grayscale
 
-		print(h, w, planes)
+def checkBitDepth(bitDepth):
+	if bitDepth not in range(1, 9):
+		raise ValueError(f'bitDepth must be between 1 and 8, not {bitDepth}.')
 
-		roomForBytes = h*w*planes*bitDepth
-		bitsToStore = len(text)*8
-		print(f'Can store {roomForBytes} bytes, got {bitsToStore}.')
 
-		print(len(imgBits), len(imgBits[0]))
+def bytesToChunks(data, bitDepth, first=0, count=None):
+	# The bytes are one stream of bits, every byte lowest bit first,
+	# cut into chunks of bitDepth bits, one per subpixel, the first bit lowest
+	# With 3, 5, 6 or 7 a chunk can take bits from two bytes, and the last one is padded with zeros
+	# With 1, 2, 4 or 8 every byte is spread across 8//bitDepth subpixels, lowest bits first, like it always was
+	# first and count pick out chunks first to first+count, only the bytes they take bits from are unpacked
+	total = -(-len(data)*8 // bitDepth)
+	end = total if count is None else min(total, first+count)
+	if first >= end:
+		return np.empty(0, dtype=np.uint8)
 
+	startBit, endBit = first*bitDepth, end*bitDepth
+	data = np.frombuffer(data, dtype=np.uint8)[startBit//8:-(-endBit//8)]
+	bits = np.unpackbits(data, bitorder='little')[startBit%8:]
+
+	size = endBit - startBit
+	if bits.size < size:
+		# Only the last chunk runs past the data
+		bits = np.concatenate([bits, np.zeros(size - bits.size, dtype=np.uint8)])
+
+	return np.packbits(bits[:size].reshape(-1, bitDepth), axis=1, bitorder='little').ravel()
+
+
+def chunksToBits(chunks, bitDepth):
+	# Inverse of bytesToChunks, up to the bit stream. chunks are already masked to bitDepth bits
+	return np.unpackbits(chunks.astype(np.uint8)[:, None], axis=1, count=bitDepth, bitorder='little').ravel()
+
+
+def roomInLSB(w, h, planes, bitDepth):
+	# How many bytes the image holds, header included
+	return w*h*planes*bitDepth // 8
+
+
+def roomOfLSB(fileName, bitDepth=1):
+	# roomInLSB, for an image on disk
+	checkBitDepth(bitDepth)
+	# Only the PNG header is read, no pixel data is decoded
+	with openImage(fileName) as ifs:
+		# A file object gets read again by whatever comes next, so it's put back where it was
+		start = ifs.tell() if getattr(ifs, 'seekable', lambda: False)() else None
+
+		reader = png.Reader(file=ifs)
+		reader.preamble()
+
+		if start is not None:
+			ifs.seek(start)
+
+	return roomInLSB(reader.width, reader.height, reader.planes, bitDepth)
+
+
+def capacityOfLSB(fileName, bitDepth=1):
+	# How many payload bytes fit, next to the container's header
+	return max(0, roomOfLSB(fileName, bitDepth) - HEADER_SIZE)
+
+
+def payloadForLSB(text, legacy=False, compression=None):
+	# The bytes that get hidden: the container, or in the legacy format the chars plus the zero the extraction stops at
+	if legacy:
+		return legacyCodes(text, 0xFF, compression).astype(np.uint8).tobytes() + b'\0'
+
+	return packPayload(text, compression)
+
+
+def checkLSBCapacity(room, payload, bitDepth=1, legacy=False):
+	# If a legacy text fills the image exactly there's no room for the terminator, and none is needed
+	needed = len(payload) - 1 if legacy else len(payload)
+
+	if needed > room:
+		what = f'Text is {needed} characters long' if legacy else f'The payload is {needed - HEADER_SIZE} bytes long'
+		room = room if legacy else max(0, room - HEADER_SIZE)
+		raise ValueError(f'{what}, but the image can only hold {room} with bitDepth {bitDepth}.')
+
+
+def embedInLSB(imgBits, payload, bitDepth=1):
+	# imgBits is modified in place: one row per image row, planes*w values each
+	# Subpixel number y*(planes*w)+i carries chunk number y*(planes*w)+i
+	flat = imgBits.reshape(-1)
+
+	# Only a legacy terminator can be left over here
+	chunks = bytesToChunks(payload, bitDepth)[:flat.size]
+	n = chunks.size
+
+	# Subpixels after the terminator are left as they are
+	flat[:n] &= ~np.array(2**bitDepth-1, dtype=flat.dtype)
+	flat[:n] |= chunks
+
+	return imgBits
+
+
+# A band is at least this many subpixels, smaller ones aren't worth sending to another process
+minBandSubpixels = 2**22
+
+# The tiled embedding keeps the image in a file the workers map too, in memory where the system has a place for it
+sharedDir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# One pool for every tiled call, starting processes costs more than embedding a band
+tilePool = None
+tilePoolWorkers = 0
+tilePoolLock = threading.Lock()
+
+
+def getTilePool(workers):
+	global tilePool, tilePoolWorkers
+	with tilePoolLock:
+		if tilePool is None or tilePoolWorkers < workers:
+			if tilePool is not None:
+				# Bands already sent to it still finish
+				tilePool.shutdown(wait=False)
+
+			# Spawned, not forked: the GUI and asyncApi call this from threads
+			tilePool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+			tilePoolWorkers = workers
+
+		return tilePool
+
+
+def dropTilePool(pool):
+	# A worker died, the next call gets a new pool
+	global tilePool
+	with tilePoolLock:
+		if tilePool is pool:
+			tilePool = None
+	pool.shutdown(wait=False, cancel_futures=True)
+
+
+def tileBands(shape, payloadSize, bitDepth, workers):
+	# The first row of every band, and how many rows each has, or None if a single process does better
+	# Bands are a multiple of 8 rows long, so a band's part of the payload always starts on a whole byte
+	h, rowLen = shape
+	if not h or not rowLen:
+		return None
+
+	# Only the rows the payload reaches are handed out
+	chunks = -(-payloadSize*8 // bitDepth)
+	rows = min(h, -(-chunks // rowLen))
+	bandRows = max(-(-rows // workers), -(-minBandSubpixels // rowLen))
+	bandRows = -(-bandRows // 8) * 8
+
+	if bandRows >= rows:
+		return None
+
+	return range(0, rows, bandRows), bandRows
 
-		# used to get message bits
-		bitMask = 2**bitDepth-1
 
-		for y in range(h):
-			for x in range(w):
-				for i in range(planes*x, planes*(x+1)):
-					imgBits[y][i] = (imgBits[y][i]>>bitDepth<<bitDepth) # set LSB to zero
+def sharedPixels(shape, dtype):
+	# An array the workers can map too and change in place. The file can go once they're done,
+	# the memory stays for as long as the array is used
+	fd, path = tempfile.mkstemp(prefix='stega-tiles-', dir=sharedDir)
+	os.close(fd)
 
-					# assumptions made here:
-					# text is ASCII, 1 byte always
-					# bitDepth is 1, 2, or 4
-					# not 3 because it doesn't divide 3 bytes. We'd have to combine bits.
-					# text fits into file
+	return np.memmap(path, dtype=dtype, mode='w+', shape=shape)
 
-					charSpreadAcross = 8//bitDepth
 
-					whichChar, offset = divmod((y*(planes*w)+i), charSpreadAcross)
+def embedBand(path, shape, dtype, y0, y1, payload, bitDepth):
+	# Runs in a worker process: embeds payload into rows y0 to y1 of the shared image, in place
+	rowLen = shape[1]
+	band = np.memmap(path, dtype=dtype, mode='r+', offset=y0*rowLen*np.dtype(dtype).itemsize, shape=(y1-y0, rowLen))
+	embedInLSB(band, payload, bitDepth)
+	del band
 
-					if whichChar >= len(text):
-						char = 0
-					else:
-						char = ord(text[whichChar])
 
-					bits = (char >> (bitDepth*offset)) & bitMask
+def embedInLSBTiled(imgBits, payload, bitDepth=1, workers=None):
+	# Same as embedInLSB, with the rows split into bands that are embedded by several processes
+	# Subpixel y*(planes*w)+i carries chunk y*(planes*w)+i, so where a band's part of the payload starts follows from its first row
+	# imgBits from sharedPixels is changed where it is, any other array is copied there and back
+	workers = workers or multiprocessing.cpu_count()
+	tiles = tileBands(imgBits.shape, len(payload), bitDepth, workers)
 
-					imgBits[y][i] += bits
-	
-	with open(outputFile, "wb") as ofs:
-		writer = None
+	if tiles is None:
+		return embedInLSB(imgBits, payload, bitDepth)
 
-		if planes == 1:
-			writer = png.Writer(w,h, greyscale=True, alpha=False)
-		elif planes == 2:
-			writer = png.Writer(w,h, greyscale=True, alpha=True)
-		elif planes == 3:
-			writer = png.Writer(w,h, greyscale=False, alpha=False)
-		elif planes == 4:
-			writer = png.Writer(w,h, greyscale=False, alpha=True)
-		writer.write(ofs, imgBits)
+	bands, bandRows = tiles
+	rows = bands.stop
+	shared = imgBits if isinstance(imgBits, np.memmap) else sharedPixels((rows, imgBits.shape[1]), imgBits.dtype)
 
+	try:
+		if shared is not imgBits:
+			shared[...] = imgBits[:rows]
 
-	return 'output-placeholder.png'
+		bandBytes = bandRows*imgBits.shape[1]*bitDepth // 8
+		pool = getTilePool(min(workers, len(bands)))
 
+		try:
+			done = [pool.submit(embedBand, shared.filename, shared.shape, shared.dtype, y, min(y+bandRows, rows), payload[i*bandBytes:(i+1)*bandBytes], bitDepth) for i, y in enumerate(bands)]
+			for future in done:
+				future.result()
+		except BrokenProcessPool:
+			dropTilePool(pool)
+			raise
 
-def getTheTextFromLSB(fileName, bitDepth=1):
-	with open(fileName, 'rb') as ifs:
-		thePNG = png.Reader(file=ifs).read()
+		if shared is not imgBits:
+			imgBits[:rows] = shared
+	finally:
+		if shared is not imgBits:
+			os.remove(shared.filename)
+
+	return imgBits
+
+
+def embedRowsInLSB(rows, info, payload, bitDepth=1):
+	# Same as embedInLSB, but takes and yields one row at a time
+	# Only the part of the payload a row carries is cut into chunks, when the row comes
+	chunks = -(-len(payload)*8 // bitDepth)
+	keep = ~np.array(2**bitDepth-1, dtype=pixelType(info))
+
+	start = 0
+	for row in rows:
+		if start >= chunks:
+			# The payload is done, the rest of the rows are copied through
+			yield row
+			continue
+
+		# pypng hands out a fresh row every time, so it's safe to change it
+		imgBits = rowToArray(row, info)
+		part = bytesToChunks(payload, bitDepth, start, imgBits.size)
+
+		imgBits[:part.size] &= keep
+		imgBits[:part.size] |= part
+
+		start += imgBits.size
+		yield imgBits
+
+
+def embedTextInImage(fileName, text, bitDepth, tracker, legacy=False, compression=None, workers=None):
+	checkBitDepth(bitDepth)
+	payload = payloadForLSB(text, legacy, compression)
+
+	if isPath(fileName):
+		# Only the header is read, so a text that doesn't fit fails before anything is decoded
+		checkLSBCapacity(roomOfLSB(fileName, bitDepth), payload, bitDepth, legacy)
+
+	if workers != 1:
+		workers = workers or multiprocessing.cpu_count()
+	shared = []
+
+	def allocate(shape, dtype):
+		# An image that gets split into bands is decoded straight into memory the workers share
+		if tileBands(shape, len(payload), bitDepth, workers) is None:
+			return np.empty(shape, dtype)
+
+		shared.append(sharedPixels(shape, dtype))
+		return shared[-1]
+
+	try:
+		imgBits, info = readImage(fileName, tracker, None if workers == 1 else allocate) # one row per image row. Each row is 3x width if 3 color channels. 4 with alpha. 1 if grayscale
+
+		# Images in memory or in a stream can only be read once, so they're checked now
+		checkLSBCapacity(imgBits.size*bitDepth // 8, payload, bitDepth, legacy)
+
+		with tracker.stats.stage('transform'):
+			# Cached pixels are shared, the embedding gets its own copy
+			if not imgBits.flags.writeable:
+				imgBits = imgBits.copy()
+
+			if workers == 1:
+				embedInLSB(imgBits, payload, bitDepth)
+			else:
+				embedInLSBTiled(imgBits, payload, bitDepth, workers)
+	finally:
+		# The workers are done with it, the pixels stay in memory for as long as they're used
+		for pixels in shared:
+			os.remove(pixels.filename)
+
+	return ImageResult(imgBits, info['planes'], info['bitdepth'])
+
+
+def putTextIntoLSBInMemory(fileName, text, bitDepth=1, progress=None, stats=None, legacy=False, compression=None, workers=1):
+	# Nothing is written, the result is encoded only when asked for
+	tracker = Progress(progress, stats=stats)
+	result = embedTextInImage(fileName, text, bitDepth, tracker, legacy, compression, workers)
+	tracker.finish()
+
+	return result
+
+
+def putTextIntoLSB(fileName, text, bitDepth=1, outputFile = None, streaming=False, progress=None, stats=None, encoding=None, legacy=False, compression=None, workers=1):
+	# text is a str or bytes. legacy hides it in the old zero terminated format, for earlier versions to read
+	# compression ('zlib' or 'lzma') shrinks it first, so it fits in fewer subpixels
+	# workers embeds bands of rows on that many processes (None for one per CPU), worth it for payloads of many megapixels
+	if streaming and workers != 1:
+		raise ValueError('Streaming embeds one row at a time, it can\'t be split over workers.')
+
+	if outputFile is None:
+		outputFile = newOutputFile('lsb')
+
+	if not streaming:
+		# Rows are counted once when decoded and once when encoded
+		tracker = Progress(progress, passes=2, stats=stats)
+		result = embedTextInImage(fileName, text, bitDepth, tracker, legacy, compression, workers)
+
+		with openOutput(outputFile) as ofs:
+			result.write(ofs, tracker, encoding)
+
+		tracker.finish()
+		return outputFile
+
+	checkBitDepth(bitDepth)
+	tracker = Progress(progress, stats=stats)
+	stats = tracker.stats
+	payload = payloadForLSB(text, legacy, compression)
+
+	with openImage(fileName) as ifs:
+		thePNG = png.Reader(file=stats.file(ifs)).read()
 
 		h = thePNG[1]
 		w = thePNG[0]
 		planes = thePNG[3]["planes"]
-		imgBits = list(thePNG[2]) # list of rows. Each row is 3x width if 3 color channels. 4 with alpha. 1 if grayscale
+
+		checkLSBCapacity(roomInLSB(w, h, planes, bitDepth), payload, bitDepth, legacy)
+
+		writer = makeWriter(w, h, planes, thePNG[3]['bitdepth'], encoding)
+
+		tracker.start(h)
+
+		# Rows go from the decoder, through the embedding, into the encoder
+		# Only a few of them are ever in memory
+		rows = stats.rows(thePNG[2], 'decode')
+		rows = stats.rows(embedRowsInLSB(rows, thePNG[3], payload, bitDepth), 'transform')
+
+		with openOutput(outputFile) as ofs, stats.stage('encode'):
+			writer.write(stats.file(ofs), tracker.rows(rows))
+
+	stats.add(pixelsRead=w*h, pixelsWritten=w*h)
+	tracker.finish()
+
+	return outputFile
+
+
+def getTheTextFromLSB(fileName, bitDepth=1, progress=None, stats=None):
+	checkBitDepth(bitDepth)
+	tracker = Progress(progress, stats=stats)
+	stats = tracker.stats
+
+	with imageRows(fileName, stats) as thePNG, stats.stage('transform'):
+
+		info = thePNG[3]
 
 		bitMask = 2**bitDepth-1
 
-		bitsCollected = 0
-		bitSoFar = 0
+		payload = PayloadReader(roomInLSB(thePNG[0], thePNG[1], info['planes'], bitDepth))
+
+		# bits of a byte that started at the end of the previous row
+		leftover = np.empty(0, dtype=np.uint8)
+
+		tracker.start(thePNG[1])
+
+		# Rows are decoded one at a time, so we stop decoding once the payload is complete
+		for row in tracker.rows(stats.rows(thePNG[2], 'decode')):
+			stats.add(pixelsRead=thePNG[0])
 
-		string = ""
-	
-		for y in range(h):
-			for x in range(w):
-				for i in range(planes*x, planes*(x+1)):
+			bits = chunksToBits(rowToArray(row, info) & bitMask, bitDepth)
+			if leftover.size:
+				bits = np.concatenate((leftover, bits))
 
+			whole = bits.size - bits.size % 8
+			leftover = bits[whole:]
 
-					bit = imgBits[y][i] & bitMask
+			if payload.feed(np.packbits(bits[:whole], bitorder='little')):
+				break
 
-					bitSoFar += bit<<bitsCollected
+		text = payload.result()
 
-					bitsCollected += bitDepth
+	tracker.finish()
 
-					if bitsCollected == 8:
-						if bitSoFar != 0:
-							# print(chr(bitSoFar))
-							string += chr(bitSoFar)
-						else:
-							return string
-						bitsCollected = 0
-						bitSoFar = 0
-		return string
+	return text
 
 
 
@@ -108,5 +391,5 @@ def getTheTextFromLSB(fileName, bitDepth=1):
 
 
 if __name__ == '__main__':
-	putTextIntoLSB('input-placeholder.png', 'Hello world!', 8)
-	print(getTextFromLSB("res.png", 8))
+	res = putTextIntoLSB('input-placeholder.png', 'Hello world!', 8)
+	print(getTheTextFromLSB(res, 8))
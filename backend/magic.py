@@ -2,54 +2,70 @@
 
 
 # required: pypng
-import png
-
-
-def magic(firstFile='a.png', secondFile='b.png', outputFile='res.png'):
-	with open(firstFile, 'rb') as ifsa, open(secondFile, 'rb') as ifsb:
-		apng = png.Reader(file=ifsa).read()
-		bpng = png.Reader(file=ifsb).read()
-
-		# Checks are skipped because I'm lazy, but basically
-		# Pictures have to be the same size
-		# Both must have 4 channels: RBGA
-		# Pictures are assumed to be greyscale (R=G=B)
-		w, h = apng[:2]
-		
-		channels = apng[3]['planes']
-
-
-		# Actual pixel data
-		apng, bpng = list(apng[2]), list(bpng[2])
-
-
-		# For each pixel
-		for y in range(h):
-			for x in range(w):
-				actX = 4*x
-				
-				# The rule is that the darkest pixel of b
-				# Can't be darker than the lightest pixel of a
-				# The simplest solution is to have
-				# a be 0-127 and b 128-255
-				acolor = apng[y][actX]//2
-				bcolor = bpng[y][actX]//2+128
-
-				# math happens here
-				opa = 255 + acolor-bcolor
-				if opa == 0:
-					opa = 1
-				lig = 255*acolor//opa
-
-				# Store new lightness value
-				for i in range(3):
-					apng[y][actX+i]=lig
-				
-				# Store new opacity value
-				apng[y][actX+3]=opa
-		
-		# Output
-		with open(outputFile, 'wb') as ofs:
-			png.Writer(w,h,greyscale=False, alpha=True).write(ofs, apng)
-	return outputFile
+import numpy as np
+
+from pngTools import readImage, openOutput, newOutputFile, Progress, ImageResult
+
+
+def magicPixels(apixels, bpixels):
+	# Both are h x w*4 RGBA arrays. Only the first (red) value of every pixel is used
+	# The rule is that the darkest pixel of b
+	# Can't be darker than the lightest pixel of a
+	# The simplest solution is to have
+	# a be 0-127 and b 128-255
+	acolor = apixels[:, 0::4].astype(np.int32)//2
+	bcolor = bpixels[:, 0::4].astype(np.int32)//2+128
+
+	# math happens here
+	opa = 255 + acolor-bcolor
+	opa[opa == 0] = 1
+	lig = 255*acolor//opa
+
+	# New lightness value in the three colors, new opacity as alpha
+	res = np.empty(apixels.shape, dtype=np.uint8)
+	for i in range(3):
+		res[:, i::4] = lig
+	res[:, 3::4] = opa
+
+	return res
+
+
+def magicImages(firstFile, secondFile, tracker):
+	# Checks are skipped because I'm lazy, but basically
+	# Pictures have to be the same size
+	# Both must have 4 channels: RBGA
+	# Pictures are assumed to be greyscale (R=G=B)
+	apixels, ainfo = readImage(firstFile, tracker)
+	bpixels, binfo = readImage(secondFile, tracker)
+
+	with tracker.stats.stage('transform'):
+		pixels = magicPixels(apixels, bpixels)
 
+	# Output is always 8 bit RGBA
+	return ImageResult(pixels, 4, 8)
+
+
+def magicInMemory(firstFile='a.png', secondFile='b.png', progress=None, stats=None):
+	# Nothing is written, the result is encoded only when asked for
+	tracker = Progress(progress, stats=stats)
+	result = magicImages(firstFile, secondFile, tracker)
+	tracker.finish()
+
+	return result
+
+
+def magic(firstFile='a.png', secondFile='b.png', outputFile=None, progress=None, stats=None, encoding=None):
+	if outputFile is None:
+		outputFile = newOutputFile('magic')
+
+	# Two images are decoded and one is encoded
+	tracker = Progress(progress, passes=3, stats=stats)
+
+	res = magicImages(firstFile, secondFile, tracker)
+
+	# Output
+	with openOutput(outputFile) as ofs:
+		res.write(ofs, tracker, encoding)
+
+	tracker.finish()
+	return outputFile
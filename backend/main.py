@@ -1,22 +1,45 @@
 import sys
-import os
+
+import numpy as np
 
 
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QPixmap
+from PyQt5.QtGui import QPixmap, QImage
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QTabWidget, QPushButton, QLabel, QFileDialog,
                              QMessageBox, QLineEdit, QFrame, QScrollArea)
+from jobs import JobControls
 from api import (
-    hideTextInLSB,
-    mixTwoImagesMagic,
+    hideTextInLSBInMemory,
+    mixTwoImagesMagicInMemory,
     getTextFromLSB,
-    mixColorChannels,
-    separateColorChannels,
-    hideTextByMakingImageLarger,
+    mixColorChannelsInMemory,
+    separateColorChannelsInMemory,
+    hideTextByMakingImageLargerInMemory,
     getTextFromLargeImage
 )
 
+
+def pixmap_from_image(image):
+    """Build a preview straight from an api ImageResult, without encoding it to PNG."""
+    pixels = image.pixels
+    if image.bitdepth > 8:
+        pixels = pixels >> 8
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+
+    if image.planes == 2:
+        # Qt has no grey + alpha format, so the grey is spread over RGB
+        pixels = pixels.reshape(image.height, image.width, 2)[:, :, [0, 0, 0, 1]]
+        pixels = np.ascontiguousarray(pixels).reshape(image.height, -1)
+
+    formats = {1: QImage.Format_Grayscale8, 2: QImage.Format_RGBA8888,
+               3: QImage.Format_RGB888, 4: QImage.Format_RGBA8888}
+    data = pixels.tobytes()
+    qimage = QImage(data, image.width, image.height, pixels.shape[1], formats[image.planes])
+
+    # The QImage only points into data, copy it before data goes away
+    return QPixmap.fromImage(qimage.copy())
+
 class LSBTab(QWidget):
     def __init__(self):
         super().__init__()
@@ -93,6 +116,9 @@ class LSBTab(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold; color: #333; border: none; background: transparent;")
 
+        # Progress bar and cancel button for the running job
+        self.job_controls = JobControls(self.start_button, self.status_label, self.download_button)
+
         # Add widgets to the scroll layout
         scroll_layout.addWidget(description_label)
         scroll_layout.addSpacing(10)
@@ -102,6 +128,8 @@ class LSBTab(QWidget):
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.start_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
+        scroll_layout.addWidget(self.job_controls, alignment=Qt.AlignCenter)
+        scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.download_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.image_box, alignment=Qt.AlignCenter)
@@ -155,7 +183,7 @@ class LSBTab(QWidget):
 
         # Internal attributes
         self.file_path = None
-        self.finished_file_path = None
+        self.result_image = None
 
     def select_file(self):
         options = QFileDialog.Options()
@@ -170,52 +198,35 @@ class LSBTab(QWidget):
             QMessageBox.warning(self, "Error", "Please provide an image and message")
             return
 
-        try:
-            # Generate the output image with hidden text
-            self.finished_file_path = "res.png"
-            hideTextInLSB(self.file_path, self.message_field.text())  # Ensure the function saves to "res.png"
+        # Generate the output image with hidden text
+        self.job_controls.start(hideTextInLSBInMemory, self.file_path, self.message_field.text(),
+                                on_finished=self.hiding_finished)
 
-            # Display the processed image
-            pixmap = QPixmap(self.finished_file_path)
-            if pixmap.isNull():
-                print("Error: Unable to load the processed image.")
-            else:
-                self.image_label.setPixmap(pixmap)
-                self.image_label.show()
-
-            self.status_label.setText("Process completed. You can now download the result.")
-            self.download_button.setEnabled(True)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
-
-    def download_file(self):
-        if not self.finished_file_path:
-            QMessageBox.warning(self, "Error", "No processed file available")
-            return
+    def hiding_finished(self, result):
+        self.result_image = result
 
-        save_path, _ = QFileDialog.getSaveFileName(self, "Save Result", "",
-                                                   "Images (*.png *.jpg)")
-        if save_path:
-            try:
-                os.replace(self.finished_file_path, save_path)
-                self.status_label.setText(f"Saved to: {save_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+        # Display the processed image
+        pixmap = pixmap_from_image(self.result_image)
+        if pixmap.isNull():
+            print("Error: Unable to load the processed image.")
+        else:
+            self.image_label.setPixmap(pixmap)
+            self.image_label.show()
 
+        self.status_label.setText("Process completed. You can now download the result.")
+        self.download_button.setEnabled(True)
 
     def download_file(self):
-        if not self.finished_file_path:
+        if self.result_image is None:
             QMessageBox.warning(self, "Error", "No processed file available")
             return
 
         save_path, _ = QFileDialog.getSaveFileName(self, "Save Result", "",
                                                    "Images (*.png *.jpg)")
         if save_path:
-            try:
-                os.replace(self.finished_file_path, save_path)
-                self.status_label.setText(f"Saved to: {save_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            # The image is only encoded now, on the job thread, and as small as it gets since it is the final file
+            self.job_controls.start(self.result_image.save, save_path, encoding='small',
+                                    on_finished=lambda path: self.status_label.setText(f"Saved to: {path}"))
 
 class RGBTab(QWidget):
     def __init__(self):
@@ -296,6 +307,9 @@ class RGBTab(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold; color: #333; border: none; background: transparent;")
 
+        # Progress bar and cancel button for the running job
+        self.job_controls = JobControls(self.start_button, self.status_label, self.download_button)
+
         # Add widgets to the scroll layout
         scroll_layout.addWidget(description_label)
         scroll_layout.addSpacing(10)
@@ -307,6 +321,8 @@ class RGBTab(QWidget):
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.start_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
+        scroll_layout.addWidget(self.job_controls, alignment=Qt.AlignCenter)
+        scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.download_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.image_box, alignment=Qt.AlignCenter)
@@ -360,7 +376,7 @@ class RGBTab(QWidget):
 
         # Internal attributes
         self.channels = {'red': None, 'green': None, 'blue': None}
-        self.finished_file_path = None
+        self.result_image = None
 
     def select_file(self, channel):
         options = QFileDialog.Options()
@@ -375,39 +391,39 @@ class RGBTab(QWidget):
             QMessageBox.warning(self, "Error", "Please select all channels")
             return
 
-        try:
-            # Call the function to combine channels
-            self.finished_file_path = mixColorChannels(
-                self.channels['red'],
-                self.channels['green'],
-                self.channels['blue']
-            )
-            self.status_label.setText("Channels combined successfully")
-            self.download_button.setEnabled(True)
-
-            # Update the image preview in the image_label
-            pixmap = QPixmap(self.finished_file_path)
-            if pixmap.isNull():
-                QMessageBox.warning(self, "Error", "Unable to load the processed image for preview.")
-            else:
-                self.image_label.setPixmap(pixmap)
-                self.image_label.show()  # Ensure the image label is visible
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        # Call the function to combine channels
+        self.job_controls.start(
+            mixColorChannelsInMemory,
+            self.channels['red'],
+            self.channels['green'],
+            self.channels['blue'],
+            on_finished=self.rgb_finished
+        )
+
+    def rgb_finished(self, result):
+        self.result_image = result
+        self.status_label.setText("Channels combined successfully")
+        self.download_button.setEnabled(True)
+
+        # Update the image preview in the image_label
+        pixmap = pixmap_from_image(self.result_image)
+        if pixmap.isNull():
+            QMessageBox.warning(self, "Error", "Unable to load the processed image for preview.")
+        else:
+            self.image_label.setPixmap(pixmap)
+            self.image_label.show()  # Ensure the image label is visible
 
     def download_file(self):
-        if not self.finished_file_path:
+        if self.result_image is None:
             QMessageBox.warning(self, "Error", "No processed file available")
             return
 
         save_path, _ = QFileDialog.getSaveFileName(self, "Save Result", "", 
                                                  "Images (*.png *.jpg)")
         if save_path:
-            try:
-                os.replace(self.finished_file_path, save_path)
-                self.status_label.setText(f"Saved to: {save_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            # The image is only encoded now, on the job thread, and as small as it gets since it is the final file
+            self.job_controls.start(self.result_image.save, save_path, encoding='small',
+                                    on_finished=lambda path: self.status_label.setText(f"Saved to: {path}"))
 
 class MagicTab(QWidget):
     def __init__(self):
@@ -489,6 +505,9 @@ class MagicTab(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold; color: #333; border: none; background: transparent;")
 
+        # Progress bar and cancel button for the running job
+        self.job_controls = JobControls(self.start_button, self.status_label, self.download_button)
+
         # Add widgets to the scroll layout
         scroll_layout.addWidget(description_label)
         scroll_layout.addSpacing(10)
@@ -497,6 +516,8 @@ class MagicTab(QWidget):
         scroll_layout.addWidget(self.image2_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.start_button, alignment=Qt.AlignCenter)
+        scroll_layout.addSpacing(10)
+        scroll_layout.addWidget(self.job_controls, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(5)
         scroll_layout.addWidget(self.download_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
@@ -552,7 +573,7 @@ class MagicTab(QWidget):
 
         # Internal attributes
         self.images = {1: None, 2: None}
-        self.finished_file_path = None
+        self.result_image = None
         self.current_box_background = "white"  # Default background for the box
 
     def select_file(self, image_num):
@@ -568,24 +589,26 @@ class MagicTab(QWidget):
             QMessageBox.warning(self, "Error", "Please select both images")
             return
 
-        try:
-            self.finished_file_path = mixTwoImagesMagic(
-                self.images[1],
-                self.images[2]
-            )
-            self.status_label.setText("Images combined successfully!")
-            self.download_button.setEnabled(True)
-
-            # Display the combined image
-            pixmap = QPixmap(self.finished_file_path)
-            if pixmap.isNull():
-                print("Error: Unable to load the processed image.")
-            else:
-                self.image_label.setPixmap(pixmap)
-                self.image_label.show()
-                self.toggle_background_button.show()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        self.job_controls.start(
+            mixTwoImagesMagicInMemory,
+            self.images[1],
+            self.images[2],
+            on_finished=self.magic_finished
+        )
+
+    def magic_finished(self, result):
+        self.result_image = result
+        self.status_label.setText("Images combined successfully!")
+        self.download_button.setEnabled(True)
+
+        # Display the combined image
+        pixmap = pixmap_from_image(self.result_image)
+        if pixmap.isNull():
+            print("Error: Unable to load the processed image.")
+        else:
+            self.image_label.setPixmap(pixmap)
+            self.image_label.show()
+            self.toggle_background_button.show()
 
     def toggle_box_background(self):
         if self.current_box_background == "white":
@@ -596,18 +619,16 @@ class MagicTab(QWidget):
             self.current_box_background = "white"
 
     def download_file(self):
-        if not self.finished_file_path:
+        if self.result_image is None:
             QMessageBox.warning(self, "Error", "No processed file available")
             return
 
         save_path, _ = QFileDialog.getSaveFileName(self, "Save Result", "",
                                                    "Images (*.png *.jpg)")
         if save_path:
-            try:
-                os.replace(self.finished_file_path, save_path)
-                self.status_label.setText(f"Saved to: {save_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            # The image is only encoded now, on the job thread, and as small as it gets since it is the final file
+            self.job_controls.start(self.result_image.save, save_path, encoding='small',
+                                    on_finished=lambda path: self.status_label.setText(f"Saved to: {path}"))
 
 class ExtractLSBTab(QWidget):
     def __init__(self):
@@ -693,6 +714,9 @@ class ExtractLSBTab(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold; color: #333; border: none; background: transparent;")
 
+        # Progress bar and cancel button for the running job
+        self.job_controls = JobControls(self.start_button, self.status_label)
+
         # Add widgets to the scroll layout
         scroll_layout.addWidget(description_label)
         scroll_layout.addSpacing(10)
@@ -704,6 +728,8 @@ class ExtractLSBTab(QWidget):
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.start_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
+        scroll_layout.addWidget(self.job_controls, alignment=Qt.AlignCenter)
+        scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.result_box, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.status_label)
@@ -774,20 +800,20 @@ class ExtractLSBTab(QWidget):
             QMessageBox.warning(self, "Error", "Please select an image file.")
             return
 
-        try:
-            # Get bit depth from the input field or use the default value
-            bit_depth = int(self.bit_depth_field.text()) if self.bit_depth_field.text().isdigit() else 1
-
-            # Call the API to extract text
-            extracted_text = getTextFromLSB(self.file_path, bitDepth=bit_depth)
-            if extracted_text:
-                self.status_label.setText("Text extracted successfully!")
-                self.result_label.setText(f"<b>Extracted Text:</b><br>{extracted_text}")
-            else:
-                self.status_label.setText("No hidden text found.")
-                self.result_label.setText("No hidden text found in the image.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        # Get bit depth from the input field or use the default value
+        bit_depth = int(self.bit_depth_field.text()) if self.bit_depth_field.text().isdigit() else 1
+
+        # Call the API to extract text
+        self.job_controls.start(getTextFromLSB, self.file_path, bitDepth=bit_depth,
+                                on_finished=self.extraction_finished)
+
+    def extraction_finished(self, extracted_text):
+        if extracted_text:
+            self.status_label.setText("Text extracted successfully!")
+            self.result_label.setText(f"<b>Extracted Text:</b><br>{extracted_text}")
+        else:
+            self.status_label.setText("No hidden text found.")
+            self.result_label.setText("No hidden text found in the image.")
 
 class SeparateChannelsTab(QWidget):
     def __init__(self):
@@ -873,6 +899,9 @@ class SeparateChannelsTab(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold; color: #333; border: none; background: transparent;")
 
+        # Progress bar and cancel button for the running job
+        self.job_controls = JobControls(self.start_button, self.status_label, self.download_channel_button)
+
         # Add widgets to the scroll layout
         scroll_layout.addWidget(description_label)
         scroll_layout.addSpacing(10)
@@ -880,6 +909,8 @@ class SeparateChannelsTab(QWidget):
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.start_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
+        scroll_layout.addWidget(self.job_controls, alignment=Qt.AlignCenter)
+        scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.check_red_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(5)
         scroll_layout.addWidget(self.check_green_button, alignment=Qt.AlignCenter)
@@ -939,7 +970,7 @@ class SeparateChannelsTab(QWidget):
 
         # Internal attributes
         self.file_path = None
-        self.channel_paths = {"red": None, "green": None, "blue": None}
+        self.channel_images = {"red": None, "green": None, "blue": None}
         self.current_channel = None  # Track the currently selected channel
 
     def select_file(self):
@@ -954,26 +985,28 @@ class SeparateChannelsTab(QWidget):
             QMessageBox.warning(self, "Error", "Please select an RGB image.")
             return
 
-        try:
-            # Call the API to separate color channels
-            red_path, green_path, blue_path = separateColorChannels(self.file_path)
-            self.channel_paths["red"] = red_path
-            self.channel_paths["green"] = green_path
-            self.channel_paths["blue"] = blue_path
+        # Call the API to separate color channels
+        self.job_controls.start(separateColorChannelsInMemory, self.file_path,
+                                on_finished=self.separation_finished)
 
-            self.status_label.setText("Channels separated successfully!")
-            for button in [self.check_red_button, self.check_green_button, self.check_blue_button]:
-                button.setEnabled(True)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+    def separation_finished(self, result):
+        red, green, blue = result
+        self.channel_images["red"] = red
+        self.channel_images["green"] = green
+        self.channel_images["blue"] = blue
+
+        self.status_label.setText("Channels separated successfully!")
+        for button in [self.check_red_button, self.check_green_button, self.check_blue_button]:
+            button.setEnabled(True)
 
     def preview_channel(self, channel):
         """Display the selected channel in the image box."""
-        if self.channel_paths[channel]:
-            self.image_label.setPixmap(QPixmap(self.channel_paths[channel]))
+        if self.channel_images[channel]:
+            self.image_label.setPixmap(pixmap_from_image(self.channel_images[channel]))
             self.image_label.show()
             self.download_channel_button.setText(f"Download {channel.capitalize()} Channel")
-            self.download_channel_button.setEnabled(True)
+            # A running job gives the buttons back once it ends
+            self.download_channel_button.setEnabled(not self.job_controls.running)
             self.current_channel = channel
             self.status_label.setText(f"Previewing {channel.capitalize()} Channel.")
         else:
@@ -981,23 +1014,21 @@ class SeparateChannelsTab(QWidget):
 
     def download_selected_channel(self):
         """Download the currently displayed channel."""
-        if self.current_channel and self.channel_paths[self.current_channel]:
+        if self.current_channel and self.channel_images[self.current_channel]:
             self.download_file(self.current_channel)
         else:
             self.status_label.setText("No channel selected for download.")
 
     def download_file(self, channel):
-        if not self.channel_paths[channel]:
+        if not self.channel_images[channel]:
             QMessageBox.warning(self, "Error", f"No {channel} channel file available.")
             return
 
         save_path, _ = QFileDialog.getSaveFileName(self, f"Save {channel.title()} Channel", "", "Images (*.png *.jpg)")
         if save_path:
-            try:
-                os.replace(self.channel_paths[channel], save_path)
-                self.status_label.setText(f"{channel.title()} channel saved to: {save_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            # The channel is only encoded now, on the job thread, and as small as it gets since it is the final file
+            self.job_controls.start(self.channel_images[channel].save, save_path, encoding='small',
+                                    on_finished=lambda path: self.status_label.setText(f"{channel.title()} channel saved to: {path}"))
 
 class HideTextInLargerImageTab(QWidget):
     def __init__(self):
@@ -1074,6 +1105,9 @@ class HideTextInLargerImageTab(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold; color: #333; border: none; background: transparent;")
 
+        # Progress bar and cancel button for the running job
+        self.job_controls = JobControls(self.start_button, self.status_label, self.download_button)
+
         # Add widgets to the scroll layout
         scroll_layout.addWidget(description_label)
         scroll_layout.addSpacing(10)
@@ -1083,6 +1117,8 @@ class HideTextInLargerImageTab(QWidget):
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.start_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
+        scroll_layout.addWidget(self.job_controls, alignment=Qt.AlignCenter)
+        scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.download_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.image_box, alignment=Qt.AlignCenter)
@@ -1136,7 +1172,7 @@ class HideTextInLargerImageTab(QWidget):
 
         # Internal attributes
         self.file_path = None
-        self.finished_file_path = None
+        self.result_image = None
 
     def select_file(self):
         options = QFileDialog.Options()
@@ -1150,35 +1186,33 @@ class HideTextInLargerImageTab(QWidget):
             QMessageBox.warning(self, "Error", "Please provide an image and text to hide.")
             return
 
-        try:
-            # Call the API to hide text by making the image larger
-            self.finished_file_path = hideTextByMakingImageLarger(self.file_path, self.text_field.text())
+        # Call the API to hide text by making the image larger
+        self.job_controls.start(hideTextByMakingImageLargerInMemory, self.file_path, self.text_field.text(),
+                                on_finished=self.hiding_finished)
 
-            # Display the processed image in the preview box
-            pixmap = QPixmap(self.finished_file_path)
-            if pixmap.isNull():
-                self.status_label.setText("Error: Unable to load the processed image.")
-            else:
-                self.image_label.setPixmap(pixmap)
-                self.image_label.show()
-                self.status_label.setText("Text hidden successfully in the enlarged image! Preview displayed.")
-                self.download_button.setEnabled(True)
+    def hiding_finished(self, result):
+        self.result_image = result
 
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        # Display the processed image in the preview box
+        pixmap = pixmap_from_image(self.result_image)
+        if pixmap.isNull():
+            self.status_label.setText("Error: Unable to load the processed image.")
+        else:
+            self.image_label.setPixmap(pixmap)
+            self.image_label.show()
+            self.status_label.setText("Text hidden successfully in the enlarged image! Preview displayed.")
+            self.download_button.setEnabled(True)
 
     def download_file(self):
-        if not self.finished_file_path:
+        if self.result_image is None:
             QMessageBox.warning(self, "Error", "No processed file available.")
             return
 
         save_path, _ = QFileDialog.getSaveFileName(self, "Save Modified Image", "", "Images (*.png *.jpg)")
         if save_path:
-            try:
-                os.replace(self.finished_file_path, save_path)
-                self.status_label.setText(f"Modified image saved to: {save_path}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", str(e))
+            # The image is only encoded now, on the job thread, and as small as it gets since it is the final file
+            self.job_controls.start(self.result_image.save, save_path, encoding='small',
+                                    on_finished=lambda path: self.status_label.setText(f"Modified image saved to: {path}"))
 
 class ExtractTextFromLargeImageTab(QWidget):
     def __init__(self):
@@ -1240,6 +1274,9 @@ class ExtractTextFromLargeImageTab(QWidget):
         self.status_label.setAlignment(Qt.AlignCenter)
         self.status_label.setStyleSheet("font-weight: bold; color: #333; border: none; background: transparent;")
 
+        # Progress bar and cancel button for the running job
+        self.job_controls = JobControls(self.start_button, self.status_label)
+
         # Result display
         self.result_label = QLabel("")
         self.result_label.setWordWrap(True)
@@ -1256,6 +1293,8 @@ class ExtractTextFromLargeImageTab(QWidget):
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.start_button, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
+        scroll_layout.addWidget(self.job_controls, alignment=Qt.AlignCenter)
+        scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.result_label, alignment=Qt.AlignCenter)
         scroll_layout.addSpacing(10)
         scroll_layout.addWidget(self.status_label)
@@ -1325,17 +1364,17 @@ class ExtractTextFromLargeImageTab(QWidget):
             QMessageBox.warning(self, "Error", "Please select an enlarged image.")
             return
 
-        try:
-            # Call the API to extract hidden text
-            extracted_text = getTextFromLargeImage(self.file_path)
-            if extracted_text:
-                self.status_label.setText("Text extracted successfully!")
-                self.result_label.setText(f"Extracted Text:\n{extracted_text}")
-            else:
-                self.result_label.setText("No hidden text found.")
-                self.status_label.setText("No hidden text found in the image.")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        # Call the API to extract hidden text
+        self.job_controls.start(getTextFromLargeImage, self.file_path,
+                                on_finished=self.extraction_finished)
+
+    def extraction_finished(self, extracted_text):
+        if extracted_text:
+            self.status_label.setText("Text extracted successfully!")
+            self.result_label.setText(f"Extracted Text:\n{extracted_text}")
+        else:
+            self.result_label.setText("No hidden text found.")
+            self.status_label.setText("No hidden text found in the image.")
 
 class MainWindow(QMainWindow):
     def __init__(self):
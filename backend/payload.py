@@ -0,0 +1,183 @@
+#!/bin/python3
+
+import lzma
+import zlib
+import struct
+import numpy as np
+
+# The container the LSB and enlarge schemes hide their payload in:
+# magic 'StG', format version, flags, payload length (4 bytes, big endian), then the payload itself
+# With the length up front, extraction decodes only as many rows as the payload takes and stops,
+# and the payload can be any bytes, UTF-8 text included
+#
+# The payload can be compressed first, a flag tells extraction how to undo it
+#
+# Images hidden before the container, or with legacy=True, hold the text's chars followed by a zero instead
+# They're told apart by the magic, and still read
+
+MAGIC = b'StG'
+VERSION = 1
+HEADER = struct.Struct('>3sBBI')
+HEADER_SIZE = HEADER.size
+
+# Flags
+TEXT = 1 # the payload is UTF-8 text, extraction gives back a str
+ZLIB = 2 # the payload is zlib compressed
+LZMA = 4 # the payload is xz compressed
+
+# name: (flag, compress, a new decompressor, what it raises on bad data)
+compressions = {
+	'zlib': (ZLIB, zlib.compress, zlib.decompressobj, zlib.error),
+	'lzma': (LZMA, lzma.compress, lzma.LZMADecompressor, lzma.LZMAError),
+}
+
+# Compressed payloads aren't decompressed past this many bytes. The header only says how long the compressed
+# payload is, and a few hundred KB of it can otherwise grow into GBs
+maxDecompressedBytes = 64*2**20
+
+
+def setDecompressedLimit(maxBytes):
+	global maxDecompressedBytes
+	if maxBytes < 0:
+		raise ValueError(f'The limit can\'t be negative, not {maxBytes}.')
+
+	maxDecompressedBytes = maxBytes
+
+
+def packPayload(data, compression=None):
+	# A str is stored as UTF-8, anything bytes-like as it is
+	flags = 0
+	if isinstance(data, str):
+		data, flags = data.encode('utf-8'), TEXT
+
+	data = bytes(data)
+
+	if compression is not None:
+		if compression not in compressions:
+			raise ValueError(f'Unknown compression: {compression}. Use one of {", ".join(compressions)}.')
+
+		flag, compress = compressions[compression][:2]
+		data, flags = compress(data), flags | flag
+
+	return HEADER.pack(MAGIC, VERSION, flags, len(data)) + data
+
+
+def decompressPayload(name, data):
+	flag, compress, decompressor, error = compressions[name]
+	limit = maxDecompressedBytes
+	stream = decompressor()
+
+	try:
+		# One byte over the limit is enough to know it's too much
+		data = stream.decompress(data, limit + 1)
+	except error as e:
+		raise ValueError(f'The payload is {name} compressed, but does not decompress ({e}). It is damaged.')
+
+	if len(data) > limit:
+		raise ValueError(f'The payload decompresses to more than {limit} bytes, the most allowed.')
+	if not stream.eof:
+		raise ValueError(f'The payload is {name} compressed, but ends early. It is damaged.')
+
+	return data
+
+
+def unpackPayload(flags, data):
+	for name, (flag, *rest) in compressions.items():
+		if flags & flag:
+			data = decompressPayload(name, data)
+
+	return data.decode('utf-8') if flags & TEXT else data
+
+
+def legacyCodes(text, mask, compression=None):
+	# The old format: one code per char, only its lowest bits, the zero that ends it is up to the scheme
+	if not isinstance(text, str):
+		raise ValueError('Only text can be hidden in the legacy format.')
+	if compression is not None:
+		raise ValueError('The legacy format has no room to say the text is compressed.')
+	if text.startswith(MAGIC.decode('ascii')):
+		# It could be taken for a header when it's read back
+		raise ValueError(f'Text starting with {MAGIC.decode("ascii")!r} can\'t be hidden in the legacy format.')
+
+	return np.fromiter(map(ord, text), dtype=np.uint32, count=len(text)) & mask
+
+
+class PayloadReader:
+	# Takes the hidden values (bytes, or the enlarge scheme's 9 bit chars) as the rows are decoded,
+	# and tells the extractor once it has the whole payload, so it can stop decoding
+	def __init__(self, room):
+		# room is how many values the image holds
+		self.room = room
+		self.parts = []
+		self.size = 0
+		self.legacy = None
+		self.flags = 0
+		self.end = None
+
+		# Legacy payloads end at the first zero, these are the values not looked at yet
+		self.unsearched = []
+		self.searched = 0
+
+	def feed(self, values):
+		# Returns True once the payload is complete
+		self.parts.append(values)
+		self.unsearched.append(values)
+		self.size += values.size
+
+		if self.legacy is None:
+			if self.size < HEADER_SIZE:
+				return False
+			self.readHeader()
+
+		if self.legacy:
+			return self.findZero()
+
+		return self.size >= self.end
+
+	def readHeader(self):
+		values = np.concatenate(self.parts)
+		self.parts = [values]
+		header = values[:HEADER_SIZE]
+
+		# Legacy chars can be more than a byte
+		magic, version, flags, length = HEADER.unpack(header.astype(np.uint8).tobytes())
+
+		# Older versions hid any text, one starting with 'StG' too. Anything that isn't a header
+		# this version could have written is read the legacy way
+		self.legacy = (magic != MAGIC or bool((header > 255).any()) or version not in range(1, VERSION+1)
+			or flags & ~(TEXT | ZLIB | LZMA) or length > self.room - HEADER_SIZE)
+		if self.legacy:
+			return
+
+		self.flags = flags
+		self.end = HEADER_SIZE + length
+		self.unsearched = []
+
+	def findZero(self):
+		for part in self.unsearched:
+			zeros = np.flatnonzero(part == 0)
+			if zeros.size:
+				self.end = self.searched + zeros[0]
+				self.unsearched = []
+				return True
+			self.searched += part.size
+
+		self.unsearched = []
+		return False
+
+	def result(self):
+		values = np.concatenate(self.parts) if self.parts else np.empty(0, dtype=np.uint8)
+
+		if self.legacy is None:
+			# The image ran out before a whole header, so it can only be legacy
+			self.legacy = True
+			self.findZero()
+
+		if self.legacy:
+			# Every value is a char, so UTF-32 maps them back exactly like chr()
+			return values[:self.end].astype('<u4').tobytes().decode('utf-32-le')
+
+		if self.size < self.end:
+			raise ValueError(f'The payload is {self.end - HEADER_SIZE} bytes long, but the image ended after {self.size - HEADER_SIZE}. It is damaged.')
+
+		return unpackPayload(self.flags, values[HEADER_SIZE:self.end].astype(np.uint8).tobytes())
@@ -0,0 +1,569 @@
+#!/bin/python3
+
+# Helpers shared by the engines to move pixel data between pypng and numpy
+# required: pypng, numpy
+import io
+import os
+import png
+import time
+import zlib
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+import numpy as np
+
+
+def pixelType(info):
+	# pypng gives 16 bit rows for 16 bit images, and bytes for everything else
+	return np.uint16 if info['bitdepth'] > 8 else np.uint8
+
+
+def rowToArray(row, info):
+	# pypng rows are bytearrays or array.arrays, so no copy is needed
+	return np.frombuffer(row, dtype=pixelType(info))
+
+
+def rowsToArray(rows, w, h, info, allocate=np.empty):
+	# One row of the array is one row of the image: w*planes values
+	# allocate(shape, dtype) makes the array, for pixels that have to go somewhere in particular
+	pixels = allocate((h, w*info['planes']), pixelType(info))
+	for y, row in enumerate(rows):
+		pixels[y] = rowToArray(row, info)
+	return pixels
+
+
+class ImageCache:
+	# Decoded images, so working on the same file again skips the decode
+	# Keyed on path, modification time and size, so a file that changed gets decoded again
+	# Once the cached pixels take more than maxBytes, the least recently used images are dropped
+	# Cached pixels are shared between callers, so they are made read-only: copy them before changing them
+	def __init__(self, maxBytes=256*2**20):
+		self.maxBytes = maxBytes
+		self.images = OrderedDict()
+		self.size = 0
+		self.lock = threading.Lock()
+
+	def key(self, fileName):
+		st = os.stat(fileName)
+		return (os.path.realpath(fileName), st.st_mtime_ns, st.st_size)
+
+	def get(self, key):
+		with self.lock:
+			entry = self.images.get(key)
+			if entry is not None:
+				self.images.move_to_end(key)
+
+		return entry
+
+	def lookup(self, fileName):
+		# (pixels, info) if fileName is cached as it is now, None otherwise
+		if not self.maxBytes:
+			return None
+
+		return self.get(self.key(fileName))
+
+	def put(self, key, pixels, info):
+		if pixels.nbytes > self.maxBytes:
+			return
+
+		pixels.setflags(write=False)
+
+		with self.lock:
+			# Older versions of the same file won't be asked for again
+			for old in [k for k in self.images if k[0] == key[0]]:
+				self.size -= self.images.pop(old)[0].nbytes
+
+			self.images[key] = (pixels, info)
+			self.size += pixels.nbytes
+			self.evict()
+
+	def evict(self):
+		while self.size > self.maxBytes:
+			pixels, info = self.images.popitem(last=False)[1]
+			self.size -= pixels.nbytes
+
+	def setLimit(self, maxBytes):
+		# 0 turns the cache off
+		with self.lock:
+			self.maxBytes = maxBytes
+			self.evict()
+
+	def clear(self):
+		with self.lock:
+			self.images.clear()
+			self.size = 0
+
+
+# Shared by every engine
+imageCache = ImageCache()
+
+
+def isPath(source):
+	return isinstance(source, (str, os.PathLike))
+
+
+class BufferReader:
+	# A file-like view of a PNG held in memory, so bytes, bytearrays and memoryviews aren't copied up front
+	# pypng reads a chunk at a time, each read copies just that chunk, same as reading from a file
+	def __init__(self, data):
+		self.data = memoryview(data).cast('B')
+		self.position = 0
+
+	def read(self, n=-1):
+		end = self.data.nbytes if n is None or n < 0 else self.position + n
+		chunk = self.data[self.position:end].tobytes()
+		self.position += len(chunk)
+
+		return chunk
+
+
+@contextmanager
+def openImage(source):
+	# Every engine reads its images through here
+	# source is a path, a bytes-like object holding a PNG, or a binary file-like object with read()
+	if isPath(source):
+		with open(source, 'rb') as ifs:
+			yield ifs
+	elif hasattr(source, 'read'):
+		yield source
+	else:
+		yield BufferReader(source)
+
+
+@contextmanager
+def openOutput(target):
+	# Every engine writes its results through here
+	# target is a path or a binary file-like object with write(), which is left open
+	if isPath(target):
+		with open(target, 'wb') as ofs:
+			yield ofs
+	else:
+		yield target
+
+
+def readImage(fileName, tracker=None, allocate=None):
+	# Decode a whole image into one array, one row per image row
+	# info is pypng's metadata dict
+	# fileName can be anything openImage takes, only images read from a path are cached
+	# The pixels may come from imageCache, and are read-only if they do or if they were just cached
+	# allocate(shape, dtype), if given, makes the array the pixels go in. It's the caller's, so it's never cached
+	stats = tracker.stats if tracker is not None else Stats()
+	key = imageCache.key(fileName) if imageCache.maxBytes and isPath(fileName) else None
+
+	cached = imageCache.get(key) if key is not None else None
+	if cached is not None:
+		pixels, info = cached
+		h, w = pixels.shape[0], pixels.shape[1] // info['planes']
+
+		if tracker is not None:
+			tracker.start(h)
+			tracker.step(h)
+
+		stats.add(pixelsRead=w*h, cacheHits=1)
+
+		if allocate is not None:
+			copy = allocate(pixels.shape, pixels.dtype)
+			copy[...] = pixels
+			return copy, dict(info)
+
+		return pixels, dict(info)
+
+	with openImage(fileName) as ifs, stats.stage('decode'):
+		w, h, rows, info = png.Reader(file=stats.file(ifs)).read()
+
+		if tracker is not None:
+			tracker.start(h)
+			rows = tracker.rows(rows)
+
+		pixels = rowsToArray(rows, w, h, info, allocate or np.empty)
+
+	stats.add(pixelsRead=w*h)
+
+	# Not cached if the file changed while it was being read
+	if key is not None and allocate is None and imageCache.key(fileName) == key:
+		imageCache.put(key, pixels, dict(info))
+
+	return pixels, info
+
+
+@contextmanager
+def imageRows(fileName, stats):
+	# For reading an image a row at a time and stopping early: gives (w, h, rows, info)
+	# Rows come from imageCache if the image is there, otherwise they're decoded one at a time as they're asked for
+	cached = imageCache.lookup(fileName) if isPath(fileName) else None
+	if cached is not None:
+		pixels, info = cached
+		stats.add(cacheHits=1)
+
+		yield pixels.shape[1] // info['planes'], pixels.shape[0], iter(pixels), dict(info)
+		return
+
+	with openImage(fileName) as ifs:
+		yield png.Reader(file=stats.file(ifs)).read()
+
+
+def newOutputFile(name='res'):
+	# A fresh file in the temp directory for results nobody asked a path for
+	# mkstemp creates the file, so no two calls, threads or processes get the same one
+	fd, path = tempfile.mkstemp(prefix=f'stega-{name}-', suffix='.png')
+	os.close(fd)
+
+	return path
+
+
+# How a PNG gets compressed
+# compression: zlib level, 0 (none) to 9 (smallest), None for zlib's default
+# filter: the PNG row filter, one of pngFilters, or 'adaptive' to pick the best one for every row like libpng does
+# chunkSize: how many bytes of rows are gathered before they're handed to zlib
+EncodeOptions = namedtuple('EncodeOptions', ['compression', 'filter', 'chunkSize'], defaults=[None, 'none', 2**20])
+
+encodePresets = {
+	'default': EncodeOptions(),
+	# Previews and intermediates: as little time spent compressing as possible
+	'fast': EncodeOptions(compression=1),
+	# Final files: as small as they get
+	'small': EncodeOptions(compression=9, filter='adaptive'),
+}
+
+# PNG filter types
+pngFilters = {'none': 0, 'sub': 1, 'up': 2, 'average': 3, 'paeth': 4}
+
+
+def encodeOptions(encoding=None):
+	# encoding is a preset name, EncodeOptions, or None for the default
+	if encoding is None:
+		return encodePresets['default']
+
+	if isinstance(encoding, str):
+		if encoding not in encodePresets:
+			raise ValueError(f'Unknown encoding: {encoding}. Use one of {", ".join(encodePresets)}, or EncodeOptions.')
+		return encodePresets[encoding]
+
+	if encoding.filter not in pngFilters and encoding.filter != 'adaptive':
+		raise ValueError(f'Unknown PNG filter: {encoding.filter}. Use one of {", ".join(pngFilters)} or adaptive.')
+	# Checked here, pypng would only complain once the image is being written
+	if encoding.compression not in (None, *range(10)):
+		raise ValueError(f'The zlib compression level must be 0 to 9, or None for the default, not {encoding.compression}.')
+	if not isinstance(encoding.chunkSize, int) or encoding.chunkSize <= 0:
+		raise ValueError(f'The chunk size must be more than 0 bytes, not {encoding.chunkSize}.')
+
+	return encoding
+
+
+def makeWriter(w, h, planes, bitdepth=8, encoding=None):
+	# Anything that isn't 16 bit gets written as 8 bit, same as before
+	bitdepth = 16 if bitdepth > 8 else 8
+	options = encodeOptions(encoding)
+
+	if planes == 1:
+		writer = png.Writer(w,h, greyscale=True, alpha=False, bitdepth=bitdepth, compression=options.compression, chunk_limit=options.chunkSize)
+	elif planes == 2:
+		writer = png.Writer(w,h, greyscale=True, alpha=True, bitdepth=bitdepth, compression=options.compression, chunk_limit=options.chunkSize)
+	elif planes == 3:
+		writer = png.Writer(w,h, greyscale=False, alpha=False, bitdepth=bitdepth, compression=options.compression, chunk_limit=options.chunkSize)
+	elif planes == 4:
+		writer = png.Writer(w,h, greyscale=False, alpha=True, bitdepth=bitdepth, compression=options.compression, chunk_limit=options.chunkSize)
+
+	# pypng only writes unfiltered rows
+	if options.filter == 'none':
+		return writer
+
+	return FilteredWriter(writer, options)
+
+
+def filterRow(filterType, x, a, b, c):
+	# x is the row's bytes, a the bytes one pixel to the left, b the row above, c the row above one pixel to the left
+	# uint8 arithmetic wraps around, which is what the PNG spec asks for
+	if filterType == 0:
+		return x
+	if filterType == 1:
+		return x - a
+	if filterType == 2:
+		return x - b
+	if filterType == 3:
+		return x - ((a.astype(np.uint16) + b) >> 1).astype(np.uint8)
+
+	# Paeth: whichever of a, b and c is closest to a + b - c
+	p = a.astype(np.int16) + b - c
+	pa = np.abs(p - a)
+	pb = np.abs(p - b)
+	pc = np.abs(p - c)
+
+	return x - np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+
+class FilteredWriter:
+	# Same interface as png.Writer, for the row filters pypng doesn't do
+	# The header and chunk framing are still pypng's
+	def __init__(self, writer, options):
+		self.writer = writer
+		self.options = options
+		self.width = writer.width
+		self.height = writer.height
+		self.bytesPerPixel = writer.planes * writer.bitdepth // 8
+		self.dtype = np.dtype('>u2') if writer.bitdepth > 8 else np.dtype(np.uint8)
+
+	def filteredRows(self, rows):
+		# Filters work on bytes, 16 bit values are big endian in a PNG
+		bpp = self.bytesPerPixel
+		previous = None
+
+		for row in rows:
+			if not isinstance(row, np.ndarray):
+				row = np.frombuffer(row, dtype=np.uint16 if self.dtype.itemsize > 1 else np.uint8)
+			x = row.astype(self.dtype, copy=False).view(np.uint8)
+
+			if previous is None:
+				previous = np.zeros_like(x)
+
+			a = np.zeros_like(x)
+			a[bpp:] = x[:-bpp]
+			c = np.zeros_like(x)
+			c[bpp:] = previous[:-bpp]
+
+			if self.options.filter == 'adaptive':
+				# The filter whose bytes, read as signed, add up to the least
+				candidates = [filterRow(f, x, a, previous, c) for f in range(5)]
+				costs = [np.abs(f.view(np.int8).astype(np.int16)).sum() for f in candidates]
+				filterType = int(np.argmin(costs))
+				filtered = candidates[filterType]
+			else:
+				filterType = pngFilters[self.options.filter]
+				filtered = filterRow(filterType, x, a, previous, c)
+
+			previous = x
+			yield filterType, filtered
+
+	def write(self, outfile, rows):
+		self.writer.write_preamble(outfile)
+
+		compressor = zlib.compressobj(-1 if self.options.compression is None else self.options.compression)
+		data = bytearray()
+
+		written = 0
+		for filterType, filtered in self.filteredRows(rows):
+			data.append(filterType)
+			data.extend(filtered)
+			written += 1
+
+			if len(data) > self.options.chunkSize:
+				compressed = compressor.compress(data)
+				if compressed:
+					png.write_chunk(outfile, b'IDAT', compressed)
+				data = bytearray()
+
+		if written != self.height:
+			raise png.ProtocolError(f'rows supplied ({written}) does not match height ({self.height})')
+
+		png.write_chunk(outfile, b'IDAT', compressor.compress(data) + compressor.flush())
+		png.write_chunk(outfile, b'IEND')
+
+		return written
+
+
+class Stats:
+	# Where the time of a call went, in seconds per stage, and how much data it moved
+	# Every moment is charged to exactly one stage: the innermost one running on that thread
+	# Stages running on several threads at once (separateChannels) add up, so they can exceed the wall time
+	# The same object can be passed to several calls, the numbers then add up across them
+	# callback, if given, gets the Stats once every call is done
+	stages = ('decode', 'transform', 'encode', 'io')
+
+	def __init__(self, callback=None):
+		self.callback = callback
+		self.seconds = dict.fromkeys(self.stages, 0.0)
+		self.pixelsRead = 0
+		self.pixelsWritten = 0
+		self.bytesRead = 0
+		self.bytesWritten = 0
+		self.cacheHits = 0
+		self.lock = threading.Lock()
+		self.clock = threading.local()
+
+	def switch(self, stage):
+		# Charge the time since the last switch on this thread to the stage that was running, then start stage
+		# Returns the stage that was running, so it can be switched back to
+		now = time.perf_counter()
+		previous = getattr(self.clock, 'stage', None)
+
+		if previous is not None:
+			with self.lock:
+				self.seconds[previous] += now - self.clock.since
+
+		self.clock.stage = stage
+		self.clock.since = now
+
+		return previous
+
+	@contextmanager
+	def stage(self, stage):
+		previous = self.switch(stage)
+		try:
+			yield
+		finally:
+			self.switch(previous)
+
+	def rows(self, rows, stage):
+		# Passes the rows through, charging the time it takes to produce each one to stage
+		# This is how the stages of a streaming pipeline get told apart
+		rows = iter(rows)
+		while True:
+			previous = self.switch(stage)
+			try:
+				row = next(rows)
+			except StopIteration:
+				return
+			finally:
+				self.switch(previous)
+
+			yield row
+
+	def file(self, f):
+		return TimedFile(f, self)
+
+	def add(self, pixelsRead=0, pixelsWritten=0, bytesRead=0, bytesWritten=0, cacheHits=0):
+		with self.lock:
+			self.pixelsRead += pixelsRead
+			self.pixelsWritten += pixelsWritten
+			self.bytesRead += bytesRead
+			self.bytesWritten += bytesWritten
+			self.cacheHits += cacheHits
+
+	def finish(self):
+		if self.callback is not None:
+			self.callback(self)
+
+	def asDict(self):
+		return {
+			**{f'{stage}Seconds': seconds for stage, seconds in self.seconds.items()},
+			'pixelsRead': self.pixelsRead,
+			'pixelsWritten': self.pixelsWritten,
+			'bytesRead': self.bytesRead,
+			'bytesWritten': self.bytesWritten,
+			'cacheHits': self.cacheHits,
+		}
+
+
+class TimedFile:
+	# Wraps a file so the time pypng spends reading and writing it is charged to io
+	def __init__(self, f, stats):
+		self.f = f
+		self.stats = stats
+
+	def read(self, n=-1):
+		with self.stats.stage('io'):
+			data = self.f.read(n)
+
+		self.stats.add(bytesRead=len(data))
+
+		return data
+
+	def write(self, data):
+		with self.stats.stage('io'):
+			self.f.write(data)
+
+		self.stats.add(bytesWritten=len(data))
+
+
+class Progress:
+	# Counts the rows handled across every pass over an image (decode, encode, ...)
+	# and reports them to callback as (done, total)
+	# callback may raise to cancel the operation, the exception comes out of the engine
+	# stats, if given, is where the engine records its timings
+	def __init__(self, callback, passes=1, stats=None):
+		self.callback = callback
+		self.passes = passes
+		self.total = None
+		self.done = 0
+		self.lock = threading.Lock()
+		self.stats = stats if stats is not None else Stats()
+
+	def finish(self):
+		# Called once the engine is done
+		self.stats.finish()
+
+	def start(self, height):
+		# The first image seen sets how many rows a pass has
+		if self.total is None:
+			self.total = self.passes*height
+
+	def step(self, n=1):
+		if self.callback is None:
+			return
+
+		# separateChannels encodes on several threads at once
+		with self.lock:
+			self.done += n
+			done = self.done
+
+		self.callback(done, self.total)
+
+	def rows(self, rows):
+		# Passes the rows through, reporting each one once it has been used
+		if self.callback is None:
+			return rows
+
+		return self._trackedRows(rows)
+
+	def _trackedRows(self, rows):
+		for row in rows:
+			yield row
+			self.step()
+
+
+class ImageResult:
+	# An image kept in memory as pixels, the PNG is only encoded once someone asks for it
+	def __init__(self, pixels, planes, bitdepth=8):
+		self.pixels = pixels # one row per image row, planes*width values each
+		self.planes = planes
+		self.bitdepth = bitdepth
+		self.encoded = None
+		self.encodedWith = None # the EncodeOptions encoded was made with
+
+	@property
+	def width(self):
+		return self.pixels.shape[1] // self.planes
+
+	@property
+	def height(self):
+		return self.pixels.shape[0]
+
+	def write(self, ofs, tracker=None, encoding=None):
+		stats = tracker.stats if tracker is not None else Stats()
+		ofs = stats.file(ofs)
+		options = encodeOptions(encoding)
+
+		stats.add(pixelsWritten=self.width*self.height)
+
+		if self.encoded is not None and self.encodedWith == options:
+			ofs.write(self.encoded)
+			return
+
+		writer = makeWriter(self.width, self.height, self.planes, self.bitdepth, options)
+
+		# Views like a single channel of a bigger image aren't contiguous, the encoder needs them to be
+		rows = (np.ascontiguousarray(row) for row in self.pixels)
+		if tracker is not None:
+			tracker.start(self.height)
+			rows = tracker.rows(rows)
+
+		with stats.stage('encode'):
+			writer.write(ofs, rows)
+
+	def pngBytes(self, encoding=None):
+		options = encodeOptions(encoding)
+
+		if self.encoded is None or self.encodedWith != options:
+			buffer = io.BytesIO()
+			self.write(buffer, encoding=options)
+			self.encoded = buffer.getvalue()
+			self.encodedWith = options
+
+		return self.encoded
+
+	def save(self, fileName, progress=None, encoding=None):
+		with openOutput(fileName) as ofs:
+			self.write(ofs, Progress(progress), encoding)
+
+		return fileName
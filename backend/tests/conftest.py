@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The engines import each other by bare name, the way they do when run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pngTools import imageCache
+
+
+@pytest.fixture(autouse=True)
+def emptyImageCache():
+	# Every test decodes its images itself
+	imageCache.clear()
+	yield
+	imageCache.clear()
@@ -0,0 +1,32 @@
+# Seeded images for the tests, so every run sees the same pixels
+
+import io
+import png
+import numpy as np
+
+
+def randomPixels(w, h, planes, seed=0, bitdepth=8):
+	# One row per image row, planes*w values each
+	rng = np.random.default_rng(seed)
+	return rng.integers(0, 2**bitdepth, size=(h, w*planes), dtype=np.uint16 if bitdepth > 8 else np.uint8)
+
+
+def encode(pixels, planes, bitdepth=8):
+	ofs = io.BytesIO()
+	png.Writer(pixels.shape[1] // planes, pixels.shape[0], greyscale=planes < 3, alpha=planes in (2, 4), bitdepth=bitdepth).write(ofs, pixels.tolist())
+
+	return ofs.getvalue()
+
+
+def cover(w, h, planes, seed=0, bitdepth=8):
+	# The same random image for the same seed, as PNG bytes and as its pixel rows
+	pixels = randomPixels(w, h, planes, seed, bitdepth)
+
+	return encode(pixels, planes, bitdepth), pixels
+
+
+def decode(data):
+	# The pixel rows of a PNG and its planes
+	w, h, rows, info = png.Reader(bytes=data).read()
+
+	return np.array([list(row) for row in rows]), info['planes']
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+import api
+from images import cover, decode
+
+
+def baselineCombine(sources):
+	# combineColorChannels from before numpy: sources is ((pixels, planes) for red, green and blue)
+	h, w = sources[0][0].shape[0], sources[0][0].shape[1] // sources[0][1]
+	data = []
+
+	for y in range(h):
+		datarow = []
+		for x in range(w):
+			for pixels, planes in sources:
+				bits = pixels[y].tolist()
+				if planes == 1:
+					datarow += [bits[x]]
+				elif planes == 2:
+					datarow += [bits[2*x]]
+				elif planes == 3:
+					datarow += [sum(bits[3*x:3*x+3])//3]
+				elif planes == 4:
+					datarow += [sum(bits[4*x:4*x+3])//3]
+
+		data += [datarow]
+
+	return np.array(data)
+
+
+@pytest.mark.parametrize('planes', [(1, 2, 3), (4, 3, 1), (2, 4, 4)])
+def testCombine(planes):
+	images = [cover(11, 6, p, seed=i) for i, p in enumerate(planes)]
+
+	result = api.mixColorChannelsInMemory(*[data for data, pixels in images])
+
+	assert result.planes == 3 and result.bitdepth == 8
+	assert np.array_equal(result.pixels, baselineCombine([(pixels, p) for (data, pixels), p in zip(images, planes)]))
+
+
+def testCombineScalesShallowerSources():
+	(red, redPixels), (green, greenPixels), (blue, bluePixels) = cover(5, 4, 1, 0), cover(5, 4, 1, 1, bitdepth=16), cover(5, 4, 1, 2, bitdepth=16)
+
+	result = api.mixColorChannelsInMemory(red, green, blue)
+
+	assert result.bitdepth == 16
+	assert np.array_equal(result.pixels[:, 0::3], redPixels.astype(np.uint16) * 257)
+	assert np.array_equal(result.pixels[:, 1::3], greenPixels)
+
+
+def baselineSeparate(pixels):
+	# separateChannels from before numpy, for an RGB image
+	h, w = pixels.shape[0], pixels.shape[1] // 3
+	channels = [[], [], []]
+
+	for y in range(h):
+		bits = pixels[y].tolist()
+		for i in range(3):
+			channels[i] += [[bits[3*x+i] for x in range(w)]]
+
+	return [np.array(channel) for channel in channels]
+
+
+def testSeparate():
+	data, pixels = cover(11, 6, 3)
+
+	results = api.separateColorChannelsInMemory(data)
+
+	for result, expected in zip(results, baselineSeparate(pixels)):
+		assert result.planes == 1
+		assert np.array_equal(result.pixels, expected)
+
+
+@pytest.mark.parametrize('bitdepth', [8, 16])
+def testSeparateWithAlpha(bitdepth):
+	data, pixels = cover(11, 6, 4, bitdepth=bitdepth)
+
+	results = api.separateColorChannelsBytes(data)
+
+	for i, result in enumerate(results):
+		channel, planes = decode(result)
+		assert planes == 1
+		assert np.array_equal(channel, pixels[:, i::4])
+
+
+@pytest.mark.parametrize('planes', [1, 2])
+def testSeparateNeedsColors(planes):
+	data, pixels = cover(11, 6, planes)
+
+	with pytest.raises(ValueError):
+		api.separateColorChannelsInMemory(data)
@@ -0,0 +1,92 @@
+import struct
+import numpy as np
+import pytest
+
+import api
+from images import cover, decode, encode
+
+
+def baselineEnlarge(pixels, planes, text):
+	# hideTextByEnlarging from before numpy, block for block, into rows instead of a file
+	chars = iter([ord(c) for c in text] + [0]*pixels.size)
+	data = []
+
+	for row in pixels.tolist():
+		uprow, downrow = [], []
+		for x in range(len(row) // planes):
+			block = row[x*planes:(x+1)*planes]
+			tl, tr, bl, br = list(block), list(block), list(block), list(block)
+
+			for i in range(planes):
+				char = next(chars)
+				tr[i] = (tr[i]>>3<<3) + (char & 7)
+				bl[i] = (bl[i]>>3<<3) + ((char>>3) & 7)
+				br[i] = (br[i]>>3<<3) + ((char>>6) & 7)
+
+			uprow += tl+tr
+			downrow += bl+br
+
+		data += [uprow, downrow]
+
+	return np.array(data)
+
+
+@pytest.mark.parametrize('planes', [1, 2, 3, 4])
+def testLegacyLayout(planes):
+	data, pixels = cover(9, 7, planes, seed=planes)
+	text = 'Hello world, ĉu vi?'
+
+	result = api.hideTextByMakingImageLargerInMemory(data, text, legacy=True).pixels
+
+	assert np.array_equal(result, baselineEnlarge(pixels, planes, text))
+
+
+def chunkTypes(data):
+	# Every chunk in the file, in order, up to its very end
+	assert data[:8] == b'\x89PNG\r\n\x1a\n'
+	types, at = [], 8
+	while at < len(data):
+		length, kind = struct.unpack('>I4s', data[at:at+8])
+		types.append(kind)
+		at += 12 + length
+
+	return types
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def testOnePNG(streaming, tmp_path):
+	data, pixels = cover(9, 7, 3)
+	out = tmp_path / 'enlarged.png'
+
+	api.hideTextByMakingImageLarger(data, 'Hello', streaming=streaming, outputFile=str(out))
+	types = chunkTypes(out.read_bytes())
+
+	assert types[0] == b'IHDR' and types[-1] == b'IEND'
+	assert types.count(b'IHDR') == 1 and types.count(b'IEND') == 1
+
+
+def testStreamingMatchesInMemory():
+	data, pixels = cover(9, 7, 4)
+
+	streamed, planes = decode(api.hideTextByMakingImageLargerBytes(data, 'Hello', streaming=True))
+
+	assert np.array_equal(streamed, api.hideTextByMakingImageLargerInMemory(data, 'Hello').pixels)
+
+
+@pytest.mark.parametrize('planes', [1, 2, 3, 4])
+def testReadsOldImages(planes):
+	data, pixels = cover(9, 7, planes, seed=planes)
+	text = 'Hello world, ĉu vi?'
+
+	old = encode(baselineEnlarge(pixels, planes, text), planes)
+
+	assert api.getTextFromLargeImageBytes(old) == text
+
+
+def testExtractionStopsAtTheEnd():
+	data, pixels = cover(10, 100, 3)
+	hidden = api.hideTextByMakingImageLargerBytes(data, 'Hello')
+
+	rows = []
+	assert api.getTextFromLargeImageBytes(hidden, progress=lambda done, total: rows.append(done)) == 'Hello'
+	assert max(rows) < 10
@@ -0,0 +1,170 @@
+import glob
+import numpy as np
+import pytest
+
+import api
+import lsb
+from lsb import embedInLSB, embedInLSBTiled, embedRowsInLSB, payloadForLSB, bytesToChunks, chunksToBits
+from images import cover, encode, decode
+
+
+def baselineLSB(pixels, planes, text, bitDepth):
+	# putTextIntoLSB from before numpy, pixel for pixel, into rows instead of a file
+	imgBits = pixels.tolist()
+	h, w = len(imgBits), len(imgBits[0]) // planes
+	bitMask = 2**bitDepth-1
+
+	for y in range(h):
+		for x in range(w):
+			for i in range(planes*x, planes*(x+1)):
+				imgBits[y][i] = (imgBits[y][i]>>bitDepth<<bitDepth)
+
+				whichChar, offset = divmod((y*(planes*w)+i), 8//bitDepth)
+				char = ord(text[whichChar]) if whichChar < len(text) else 0
+
+				imgBits[y][i] += (char >> (bitDepth*offset)) & bitMask
+
+	return np.array(imgBits)
+
+
+@pytest.mark.parametrize('planes', [1, 3, 4])
+@pytest.mark.parametrize('bitDepth', [1, 2, 4, 8])
+def testLegacyLayout(bitDepth, planes):
+	data, pixels = cover(16, 12, planes, seed=bitDepth)
+	text = 'Hello world!'
+
+	result = api.hideTextInLSBInMemory(data, text, bitDepth, legacy=True).pixels
+	expected = baselineLSB(pixels, planes, text, bitDepth)
+
+	# Up to the terminator it's the old layout
+	n = (len(text)+1)*8//bitDepth
+	assert np.array_equal(result.reshape(-1)[:n], expected.reshape(-1)[:n])
+	# Past it the cover is left as it was
+	assert np.array_equal(result.reshape(-1)[n:], pixels.reshape(-1)[n:])
+
+
+@pytest.mark.parametrize('bitDepth', [1, 2, 4, 8])
+def testReadsOldImages(bitDepth):
+	data, pixels = cover(16, 12, 3, seed=bitDepth)
+	old = encode(baselineLSB(pixels, 3, 'Hello world!', bitDepth), 3)
+
+	assert api.getTextFromLSBBytes(old, bitDepth) == 'Hello world!'
+
+
+def testExtractionStopsAtTheEnd():
+	data, pixels = cover(10, 200, 3)
+	hidden = api.hideTextInLSBBytes(data, 'Hello', 1)
+
+	rows = []
+	assert api.getTextFromLSBBytes(hidden, 1, progress=lambda done, total: rows.append(done)) == 'Hello'
+	# The text ends in the second row, nothing after it is decoded
+	assert max(rows) < 5
+
+
+@pytest.mark.parametrize('bitDepth', [1, 2, 4, 8])
+def testStreamingMatchesInMemory(bitDepth):
+	data, pixels = cover(40, 30, 3, seed=bitDepth)
+	text = 'Hello world! ' * 20
+
+	streamed, planes = decode(api.hideTextInLSBBytes(data, text, bitDepth, streaming=True))
+
+	assert np.array_equal(streamed, api.hideTextInLSBInMemory(data, text, bitDepth).pixels)
+
+
+def testStreamingTakesARowAtATime():
+	data, pixels = cover(30, 20, 3)
+	pulled = []
+
+	def rows():
+		for y, row in enumerate(pixels):
+			pulled.append(y)
+			yield bytearray(row)
+
+	embedded = embedRowsInLSB(rows(), {'bitdepth': 8}, payloadForLSB('Hello world! ' * 20), 1)
+
+	for y, row in enumerate(embedded):
+		assert len(pulled) == y+1
+
+
+def testCapacity(tmp_path):
+	data, pixels = cover(16, 12, 3)
+	capacity = api.getLSBCapacity(data, 2)
+
+	hidden = api.hideTextInLSBBytes(data, b'x' * capacity, 2)
+	assert api.getTextFromLSBBytes(hidden, 2) == b'x' * capacity
+
+	# Too much for the image fails before any of it is decoded
+	coverFile = tmp_path / 'cover.png'
+	coverFile.write_bytes(data)
+	rows = []
+	with pytest.raises(ValueError):
+		api.hideTextInLSB(str(coverFile), b'x' * (capacity+1), 2, outputFile=str(tmp_path / 'out.png'), progress=lambda done, total: rows.append(done))
+	assert rows == []
+
+
+@pytest.mark.parametrize('bitdepth', [8, 16])
+@pytest.mark.parametrize('bitDepth', range(1, 9))
+def testEveryBitDepth(bitDepth, bitdepth):
+	data, pixels = cover(40, 30, 3, seed=bitDepth, bitdepth=bitdepth)
+
+	for payload in ['Hello world! ' * 5 + 'żółw', bytes(range(256))]:
+		inMemory = api.hideTextInLSBInMemory(data, payload, bitDepth)
+		streamed, planes = decode(api.hideTextInLSBBytes(data, payload, bitDepth, streaming=True))
+
+		assert np.array_equal(streamed, inMemory.pixels)
+		assert api.getTextFromLSBBytes(inMemory.pngBytes(), bitDepth) == payload
+		# Only the lowest bitDepth bits change
+		assert not ((inMemory.pixels ^ pixels) >> bitDepth).any()
+
+
+@pytest.mark.parametrize('bitDepth', range(1, 9))
+def testBitstream(bitDepth):
+	data = np.random.default_rng(bitDepth).integers(0, 256, 101, dtype=np.uint8).tobytes()
+	chunks = bytesToChunks(data, bitDepth)
+
+	assert chunks.size == -(-len(data)*8 // bitDepth)
+	assert chunks.max() < 2**bitDepth
+	assert np.packbits(chunksToBits(chunks, bitDepth)[:len(data)*8], bitorder='little').tobytes() == data
+
+	# Any range of chunks is cut from only the bytes it needs, and matches the whole
+	for first in range(0, chunks.size + 2, 7):
+		for count in (1, 5, 64, 1000):
+			assert np.array_equal(bytesToChunks(data, bitDepth, first, count), chunks[first:first+count])
+
+
+@pytest.mark.parametrize('bitDepth', [0, 9])
+def testBadBitDepth(bitDepth):
+	data, pixels = cover(16, 12, 3)
+
+	with pytest.raises(ValueError):
+		api.hideTextInLSBBytes(data, 'Hello', bitDepth)
+	with pytest.raises(ValueError):
+		api.getTextFromLSBBytes(data, bitDepth)
+
+
+@pytest.mark.parametrize('dtype', [np.uint8, np.uint16])
+@pytest.mark.parametrize('bitDepth', [1, 3, 8])
+def testTiledMatchesSingleProcess(bitDepth, dtype, monkeypatch):
+	# Small bands, so an image this size is split over the workers
+	monkeypatch.setattr(lsb, 'minBandSubpixels', 1000)
+	pixels = np.random.default_rng(bitDepth).integers(0, 256, (133, 71*3)).astype(dtype)
+
+	for payload in [payloadForLSB(bytes(range(256)) * (pixels.size*bitDepth // 8 // 256 - 1)), payloadForLSB('x' * (pixels.size*bitDepth // 8), legacy=True)]:
+		assert lsb.tileBands(pixels.shape, len(payload), bitDepth, 4) is not None
+		single = embedInLSB(pixels.copy(), payload, bitDepth)
+		assert np.array_equal(embedInLSBTiled(pixels.copy(), payload, bitDepth, 4), single)
+
+
+def testTiledThroughTheAPI(monkeypatch):
+	monkeypatch.setattr(lsb, 'minBandSubpixels', 1000)
+	data, pixels = cover(71, 133, 3)
+	payload = bytes(range(256)) * 25
+
+	single = api.hideTextInLSBInMemory(data, payload, 2)
+	tiled = api.hideTextInLSBInMemory(data, payload, 2, workers=4)
+
+	# Decoded straight into the memory the workers share, which is gone from the file system once they're done
+	assert isinstance(tiled.pixels, np.memmap)
+	assert not glob.glob(tiled.pixels.filename)
+	assert np.array_equal(tiled.pixels, single.pixels)
+	assert api.getTextFromLSBBytes(tiled.pngBytes(), 2) == payload
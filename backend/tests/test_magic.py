@@ -0,0 +1,45 @@
+import numpy as np
+
+import api
+from images import cover, encode
+
+
+def baselineMagic(apixels, bpixels):
+	# magic() from before numpy, pixel for pixel, into rows instead of a file
+	res = apixels.tolist()
+	h, w = apixels.shape[0], apixels.shape[1] // 4
+
+	for y in range(h):
+		for x in range(w):
+			acolor = int(apixels[y][4*x])//2
+			bcolor = int(bpixels[y][4*x])//2+128
+
+			opa = 255 + acolor-bcolor
+			if opa == 0:
+				opa = 1
+			lig = 255*acolor//opa
+
+			for i in range(3):
+				res[y][4*x+i] = lig
+			res[y][4*x+3] = opa
+
+	return np.array(res)
+
+
+def testMagic():
+	adata, apixels = cover(10, 8, 4, seed=1)
+	bdata, bpixels = cover(10, 8, 4, seed=2)
+
+	result = api.mixTwoImagesMagicInMemory(adata, bdata)
+
+	assert result.planes == 4
+	assert np.array_equal(result.pixels, baselineMagic(apixels, bpixels))
+
+
+def testMagicExtremes():
+	# Black under white is where the opacity would be 0
+	black = np.zeros((2, 8), dtype=np.uint8)
+	white = np.full((2, 8), 255, dtype=np.uint8)
+
+	for a, b in [(black, white), (white, black), (white, white), (black, black)]:
+		assert np.array_equal(api.mixTwoImagesMagicInMemory(encode(a, 4), encode(b, 4)).pixels, baselineMagic(a, b))
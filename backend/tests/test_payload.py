@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+import api
+import payload
+from payload import HEADER, HEADER_SIZE, MAGIC, TEXT, PayloadReader, packPayload
+from images import cover
+
+
+payloads = ['Hello world! ' * 5 + 'żółw', bytes(range(256)), '', b'']
+
+
+def readBack(data, room=1000):
+	reader = PayloadReader(room)
+	reader.feed(np.frombuffer(data, dtype=np.uint8))
+
+	return reader.result()
+
+
+@pytest.mark.parametrize('payload', payloads)
+def testRoundTrip(payload):
+	data, pixels = cover(40, 30, 3)
+
+	assert api.getTextFromLSBBytes(api.hideTextInLSBBytes(data, payload, 2), 2) == payload
+	assert api.getTextFromLargeImageBytes(api.hideTextByMakingImageLargerBytes(data, payload)) == payload
+
+
+def testOnlyTheHeaderAndPayloadAreRead():
+	data, pixels = cover(10, 200, 3)
+	hidden = api.hideTextInLSBBytes(data, b'\0' * 20, 8)
+
+	rows = []
+	assert api.getTextFromLSBBytes(hidden, 8, progress=lambda done, total: rows.append(done)) == b'\0' * 20
+	assert max(rows, default=0) <= 1
+
+
+def testLegacyTextThatLooksLikeAHeader():
+	# Older versions hid any text, so 'StG' followed by anything a header can't hold is read the old way
+	data, pixels = cover(40, 30, 3)
+	for text in ['StGood morning', 'StG' + chr(2) + chr(TEXT) + 'abcd', 'StG' + chr(1) + chr(64) + 'abcd']:
+		legacy = text.encode('latin-1') + b'\0'
+		assert readBack(legacy) == text
+
+	# A length past the end of the image can't be a header either
+	header = HEADER.pack(MAGIC, 1, TEXT, 0x01010101)
+	assert readBack(header + b'abc\0', room=100) == (header + b'abc').decode('latin-1')
+
+	# Such text can't be written in the legacy format any more, it could be taken for a header
+	with pytest.raises(ValueError):
+		api.hideTextInLSBBytes(data, 'StGood morning', legacy=True)
+
+
+def testDamagedPayload():
+	# The header says there's more than the image holds
+	data = packPayload('Hello')
+	with pytest.raises(ValueError):
+		readBack(data[:-2], room=HEADER_SIZE + 5)
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+@pytest.mark.parametrize('payload', payloads)
+def testCompressedRoundTrip(payload, compression):
+	data, pixels = cover(40, 30, 3)
+
+	for streaming in (False, True):
+		hidden = api.hideTextInLSBBytes(data, payload, 2, streaming=streaming, compression=compression)
+		assert api.getTextFromLSBBytes(hidden, 2) == payload
+
+		hidden = api.hideTextByMakingImageLargerBytes(data, payload, streaming=streaming, compression=compression)
+		assert api.getTextFromLargeImageBytes(hidden) == payload
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def testCompressionMakesRoom(compression):
+	data, pixels = cover(32, 24, 3)
+	text = 'Hello world! ' * 100
+
+	with pytest.raises(ValueError):
+		api.hideTextInLSBBytes(data, text, 1)
+
+	assert api.getTextFromLSBBytes(api.hideTextInLSBBytes(data, text, 1, compression=compression), 1) == text
+
+
+@pytest.fixture
+def payloadLimit():
+	limit = payload.maxDecompressedBytes
+	yield api.setPayloadSizeLimit
+	api.setPayloadSizeLimit(limit)
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def testDecompressionLimit(compression, payloadLimit):
+	data = packPayload(b'\0' * 10000, compression)
+
+	payloadLimit(10000)
+	assert readBack(data) == b'\0' * 10000
+
+	payloadLimit(9999)
+	with pytest.raises(ValueError):
+		readBack(data)
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def testDamagedCompressedPayload(compression):
+	data = bytearray(packPayload(bytes(range(256)) * 4, compression))
+
+	# Cut short, and with its stream garbled
+	for damaged in [data[:HEADER_SIZE] + data[HEADER_SIZE:-10], data[:HEADER_SIZE+2] + b'\xff' * (len(data) - HEADER_SIZE - 2)]:
+		damaged[5:9] = (len(damaged) - HEADER_SIZE).to_bytes(4, 'big')
+		with pytest.raises(ValueError):
+			readBack(bytes(damaged), room=len(damaged))
@@ -0,0 +1,111 @@
+import os
+import numpy as np
+import pytest
+
+import api
+from pngTools import readImage, imageCache, Progress, Stats, EncodeOptions, ImageResult, encodeOptions, encodePresets, pngFilters
+from images import cover, decode
+
+
+def read(path):
+	# The pixels, and whether they came from the cache
+	stats = Stats()
+	pixels, info = readImage(str(path), Progress(None, stats=stats))
+
+	return pixels, stats.cacheHits
+
+
+@pytest.fixture
+def cacheLimit():
+	# Tests change the limit through this, it's put back after
+	limit = imageCache.maxBytes
+	yield api.setImageCacheLimit
+	api.setImageCacheLimit(limit)
+
+
+def testCacheHit(tmp_path):
+	data, pixels = cover(8, 5, 3)
+	path = tmp_path / 'a.png'
+	path.write_bytes(data)
+
+	assert read(path)[1] == 0
+	cached, hits = read(path)
+
+	assert hits == 1
+	assert np.array_equal(cached, pixels)
+	assert not cached.flags.writeable
+
+
+def testCacheSeesChangedFiles(tmp_path):
+	path = tmp_path / 'a.png'
+	path.write_bytes(cover(8, 5, 3, seed=1)[0])
+	read(path)
+
+	# Same size, only the pixels and the modification time differ
+	data, pixels = cover(8, 5, 3, seed=2)
+	path.write_bytes(data)
+	st = os.stat(path)
+	os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+	changed, hits = read(path)
+	assert hits == 0
+	assert np.array_equal(changed, pixels)
+
+
+def testCacheEvictsLeastRecentlyUsed(tmp_path, cacheLimit):
+	paths = [tmp_path / f'{i}.png' for i in range(3)]
+	for i, path in enumerate(paths):
+		path.write_bytes(cover(8, 5, 3, seed=i)[0])
+
+	# Room for two images
+	cacheLimit(2 * 8*5*3)
+	read(paths[0])
+	read(paths[1])
+	read(paths[0])
+	read(paths[2])
+
+	assert imageCache.lookup(str(paths[1])) is None
+	assert read(paths[0])[1] == 1
+	assert read(paths[2])[1] == 1
+
+	cacheLimit(0)
+	assert read(paths[0])[1] == 0
+
+
+def testEnginesDontChangeCachedPixels(tmp_path):
+	data, pixels = cover(16, 12, 3)
+	path = tmp_path / 'a.png'
+	path.write_bytes(data)
+	read(path)
+
+	api.hideTextInLSBInMemory(str(path), 'Hello', 8)
+
+	cached, hits = read(path)
+	assert hits == 1
+	assert np.array_equal(cached, pixels)
+
+
+@pytest.mark.parametrize('bitdepth', [8, 16])
+@pytest.mark.parametrize('planes', [1, 2, 3, 4])
+@pytest.mark.parametrize('filter', [*pngFilters, 'adaptive'])
+def testFilteredWriter(filter, planes, bitdepth):
+	data, pixels = cover(13, 9, planes, seed=planes, bitdepth=bitdepth)
+
+	encoded = ImageResult(pixels, planes, bitdepth).pngBytes(EncodeOptions(compression=6, filter=filter))
+	decoded, decodedPlanes = decode(encoded)
+
+	assert decodedPlanes == planes
+	assert np.array_equal(decoded, pixels)
+
+
+@pytest.mark.parametrize('encoding', list(encodePresets))
+def testPresets(encoding):
+	data, pixels = cover(13, 9, 3)
+
+	assert np.array_equal(decode(ImageResult(pixels, 3).pngBytes(encoding))[0], pixels)
+
+
+@pytest.mark.parametrize('encoding', ['tiny', EncodeOptions(filter='best'), EncodeOptions(compression=10), EncodeOptions(compression=-1), EncodeOptions(chunkSize=0), EncodeOptions(chunkSize=None)])
+def testBadEncodings(encoding):
+	with pytest.raises(ValueError):
+		encodeOptions(encoding)